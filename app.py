@@ -3,37 +3,134 @@ import os
 import uuid
 import time
 import json
+import hashlib
+import tempfile
+import html
+import mimetypes
+import shutil
+import zipfile
+import struct
+import zlib
+import bisect
+import math
+import re
 import threading
+import contextvars
+import itertools
+import queue
+from collections import deque
+import asyncio
+import sqlite3
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import traceback
-from flask import Flask, render_template, request, jsonify, send_from_directory, abort, Response
+import unicodedata
+import atexit
+import functools
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from flask import Flask, render_template, request, jsonify, send_file, abort, Response
 import openai
+import httpx
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
+from urllib.parse import quote
+from werkzeug.http import is_resource_modified
 from docx import Document
-from docx.shared import Pt, Inches, Cm
+from docx.shared import Pt, Inches, Cm, Emu, RGBColor
 from docx.enum.section import WD_ORIENT
 from docx.enum.section import WD_SECTION
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from lxml import etree
+from xml.sax.saxutils import escape as xml_escape
 
 # Configure logging
 # Create logs directory if it doesn't exist
 LOGS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
 os.makedirs(LOGS_DIR, exist_ok=True)
 
+# Levels for the log file and the console (DEBUG, INFO, WARNING, ...)
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+CONSOLE_LOG_LEVEL = os.environ.get('CONSOLE_LOG_LEVEL', LOG_LEVEL).upper()
+# Log one in this many records of high-frequency events such as status polls (1 logs them all)
+LOG_SAMPLE_EVERY = max(1, int(os.environ.get('LOG_SAMPLE_EVERY', 20)))
+# Records waiting for the log writer thread; further records are dropped rather than block requests
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+
+class SamplingFilter(logging.Filter):
+    """Let through one in `every` records logged with extra={'sample': key}, counted per key
+    
+    Records without a sample key always pass.
+    """
+    
+    def __init__(self, every):
+        super().__init__()
+        self.every = every
+        self.counts = {}
+        self.lock = threading.Lock()
+    
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None or self.every <= 1:
+            return True
+        with self.lock:
+            count = self.counts.get(key, 0)
+            self.counts[key] = count + 1
+        return count % self.every == 0
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records when the queue is full instead of raising"""
+    
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
 # Set up file handler with rotation
 log_file = os.path.join(LOGS_DIR, 'app.log')
 file_handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=10)
 file_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-file_handler.setLevel(logging.INFO)
+file_handler.setLevel(LOG_LEVEL)
 
 # Set up console handler
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-console_handler.setLevel(logging.INFO)
+console_handler.setLevel(CONSOLE_LOG_LEVEL)
+
+# Request threads only put records on a queue; a listener thread does the
+# formatting, file writes and rotation off the request path
+log_queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+# The listener's handlers apply the real format; the queued record only carries the message
+log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+log_queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_EVERY))
+log_listener = QueueListener(log_queue_handler.queue, file_handler, console_handler, respect_handler_level=True)
+log_listener.start()
+# Flush records still queued when the process exits
+atexit.register(log_listener.stop)
+
+def restart_log_listener():
+    """Give a forked child its own log queue and writer thread (threads don't survive a fork)"""
+    log_queue_handler.queue = log_listener.queue = queue.Queue(LOG_QUEUE_SIZE)
+    log_listener._thread = None
+    log_listener.start()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=restart_log_listener)
 
 # Configure root logger
-logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
+logging.basicConfig(
+    level=min(logging.getLevelName(LOG_LEVEL), logging.getLevelName(CONSOLE_LOG_LEVEL)),
+    handlers=[log_queue_handler]
+)
 logger = logging.getLogger(__name__)
 
 logger.info("Starting Latin Processing Web Application")
@@ -58,12 +155,127 @@ else:
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
     PROCESSED_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'processed')
 
+# Model responses are cached next to the processed folder (on the persistent disk on Render)
+RESPONSE_CACHE_FOLDER = os.environ.get('RESPONSE_CACHE_FOLDER', os.path.join(os.path.dirname(PROCESSED_FOLDER), 'response_cache'))
+
+# Task state lives in a SQLite database shared by all gunicorn workers
+TASK_DB_PATH = os.environ.get('TASK_DB_PATH', os.path.join(os.path.dirname(PROCESSED_FOLDER), 'tasks.db'))
+
+# Completed chunks and files of running tasks are appended here so interrupted tasks can resume
+CHECKPOINT_FOLDER = os.environ.get('CHECKPOINT_FOLDER', os.path.join(os.path.dirname(PROCESSED_FOLDER), 'checkpoints'))
+
+# Rendered HTML preview pages of processed documents, least recently used deleted first past the size limit
+PREVIEW_CACHE_FOLDER = os.environ.get('PREVIEW_CACHE_FOLDER', os.path.join(os.path.dirname(PROCESSED_FOLDER), 'previews'))
+PREVIEW_PAGE_ROWS = int(os.environ.get('PREVIEW_PAGE_ROWS', 50))
+PREVIEW_CACHE_MAX_BYTES = int(os.environ.get('PREVIEW_CACHE_MAX_BYTES', 50 * 1024 * 1024))  # 50 MB
+
+# Let a front proxy send processed files: '' (gunicorn sends them), 'x-sendfile'
+# (Apache/lighttpd, header holds the file path) or 'x-accel-redirect' (nginx,
+# header holds X_ACCEL_REDIRECT_PREFIX + file name; map it to an internal
+# location aliasing the processed folder)
+FILE_OFFLOAD_MODE = os.environ.get('FILE_OFFLOAD_MODE', '').lower()
+X_ACCEL_REDIRECT_PREFIX = os.environ.get('X_ACCEL_REDIRECT_PREFIX', '/internal/processed/')
+
 logger.info(f"Upload folder: {UPLOAD_FOLDER}")
 logger.info(f"Processed folder: {PROCESSED_FOLDER}")
+logger.info(f"Response cache folder: {RESPONSE_CACHE_FOLDER}")
+logger.info(f"Task database: {TASK_DB_PATH}")
+logger.info(f"Checkpoint folder: {CHECKPOINT_FOLDER}")
+logger.info(f"Preview cache folder: {PREVIEW_CACHE_FOLDER}")
 
 ALLOWED_EXTENSIONS = {'docx'}
 MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max upload size
 
+# ZIP archive uploads: limits on the archive itself, on each letter in it and on
+# the letters' total unpacked size
+ZIP_MAX_ARCHIVE_BYTES = int(os.environ.get('ZIP_MAX_ARCHIVE_BYTES', 200 * 1024 * 1024))  # 200 MB
+ZIP_MAX_ENTRY_BYTES = int(os.environ.get('ZIP_MAX_ENTRY_BYTES', MAX_CONTENT_LENGTH))
+ZIP_MAX_TOTAL_BYTES = int(os.environ.get('ZIP_MAX_TOTAL_BYTES', 500 * 1024 * 1024))  # 500 MB
+ZIP_MAX_ENTRIES = int(os.environ.get('ZIP_MAX_ENTRIES', 1000))
+
+# Maximum number of chunk requests a single letter keeps in flight; they are
+# coroutines on the shared OpenAI event loop, not threads
+MAX_CONCURRENT_CHUNKS = int(os.environ.get('MAX_CONCURRENT_CHUNKS', 8))
+
+# A processing task whose heartbeat is older than this is considered interrupted and resumed
+TASK_HEARTBEAT_INTERVAL = int(os.environ.get('TASK_HEARTBEAT_INTERVAL', 30))
+TASK_STALE_SECONDS = int(os.environ.get('TASK_STALE_SECONDS', 120))
+RESUME_INTERRUPTED_TASKS = os.environ.get('RESUME_INTERRUPTED_TASKS', 'true').lower() == 'true'
+
+# Maximum number of letters a single task processes in parallel
+MAX_CONCURRENT_FILES = int(os.environ.get('MAX_CONCURRENT_FILES', 4))
+
+# Tasks processed at once by this worker process; further tasks wait in a priority queue
+MAX_ACTIVE_TASKS = int(os.environ.get('MAX_ACTIVE_TASKS', 4))
+
+# Chunk requests in flight across all tasks of this worker process; slots are
+# handed out round-robin between tasks, so a small task isn't stuck behind a big batch
+MAX_IN_FLIGHT_REQUESTS = int(os.environ.get('MAX_IN_FLIGHT_REQUESTS', 24))
+
+# Priority levels a task can be given when processing starts
+TASK_PRIORITIES = {'low': 0, 'normal': 1, 'high': 2}
+
+# Translate each corrected chunk as soon as it arrives instead of after the whole letter
+PIPELINED_PROCESSING = os.environ.get('PIPELINED_PROCESSING', 'true').lower() == 'true'
+
+# Correct and translate each chunk with one request that answers in JSON, falling back
+# to separate correction and translation requests when the answer doesn't validate
+COMBINED_PROCESSING = os.environ.get('COMBINED_PROCESSING', 'false').lower() == 'true'
+
+# Server-Sent Events: how often the task store is checked for changes, how often a
+# keep-alive comment is sent, and how long one stream stays open before the
+# browser reconnects (which frees the worker thread)
+SSE_POLL_INTERVAL = float(os.environ.get('SSE_POLL_INTERVAL', 0.5))
+SSE_HEARTBEAT_INTERVAL = 15
+SSE_MAX_STREAM_SECONDS = int(os.environ.get('SSE_MAX_STREAM_SECONDS', 300))
+# Each open stream holds a worker thread, so a worker keeps at most this many open (keep it
+# below gunicorn's --threads); further pages get a 503 and poll /status instead
+SSE_MAX_STREAMS = int(os.environ.get('SSE_MAX_STREAMS', 4))
+
+# OpenAI model used for correction and translation
+OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o')
+MODEL_CONTEXT_TOKENS = int(os.environ.get('MODEL_CONTEXT_TOKENS', 128000))
+MAX_OUTPUT_TOKENS = int(os.environ.get('MAX_OUTPUT_TOKENS', 4000))
+# A combined answer carries both the corrected Latin and the Dutch, so it gets twice the room
+COMBINED_MAX_OUTPUT_TOKENS = int(os.environ.get('COMBINED_MAX_OUTPUT_TOKENS', 2 * MAX_OUTPUT_TOKENS))
+
+# Chunking: rough characters per token for early modern Latin, and the share of
+# max_tokens a chunk's expected output may fill (leaves room for the model to
+# expand the text and keeps each call well inside the request timeout)
+CHARS_PER_TOKEN = float(os.environ.get('CHARS_PER_TOKEN', 3.5))
+CHUNK_OUTPUT_FILL = float(os.environ.get('CHUNK_OUTPUT_FILL', 0.5))
+
+# Account-wide OpenAI limits shared by every processing thread in this process
+OPENAI_REQUESTS_PER_MINUTE = int(os.environ.get('OPENAI_REQUESTS_PER_MINUTE', 500))
+OPENAI_TOKENS_PER_MINUTE = int(os.environ.get('OPENAI_TOKENS_PER_MINUTE', 300000))
+OPENAI_TIMEOUT = int(os.environ.get('OPENAI_TIMEOUT', 30))
+
+# Connection pool of the process-wide OpenAI client
+OPENAI_MAX_CONNECTIONS = int(os.environ.get('OPENAI_MAX_CONNECTIONS', 100))
+OPENAI_KEEPALIVE_CONNECTIONS = int(os.environ.get('OPENAI_KEEPALIVE_CONNECTIONS', 20))
+OPENAI_KEEPALIVE_EXPIRY = float(os.environ.get('OPENAI_KEEPALIVE_EXPIRY', 60))
+
+# Hedged requests: when a request has been out longer than this percentile of the
+# stage's recent latencies (and at least HEDGE_MIN_DELAY seconds), send a duplicate
+# and use whichever answers first. HEDGE_BUDGET caps hedges as a fraction of requests.
+HEDGE_REQUESTS = os.environ.get('HEDGE_REQUESTS', 'false').lower() == 'true'
+HEDGE_PERCENTILE = float(os.environ.get('HEDGE_PERCENTILE', 0.95))
+HEDGE_MIN_DELAY = float(os.environ.get('HEDGE_MIN_DELAY', 2.0))
+HEDGE_BUDGET = float(os.environ.get('HEDGE_BUDGET', 0.05))
+HEDGE_MIN_SAMPLES = int(os.environ.get('HEDGE_MIN_SAMPLES', 20))
+
+# Text extraction: also take paragraphs inside tables, and the text of headers,
+# footers, footnotes and endnotes (appended after the body)
+EXTRACT_TABLE_TEXT = os.environ.get('EXTRACT_TABLE_TEXT', 'false').lower() == 'true'
+EXTRACT_NOTE_TEXT = os.environ.get('EXTRACT_NOTE_TEXT', 'false').lower() == 'true'
+
+# Reuse the finished result of an earlier task when identical letter content is uploaded again
+REUSE_PROCESSED_RESULTS = os.environ.get('REUSE_PROCESSED_RESULTS', 'true').lower() == 'true'
+
+# Disk-backed cache of model responses
+RESPONSE_CACHE_ENABLED = os.environ.get('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 100 * 1024 * 1024))  # 100 MB
+
 # Create directories if they don't exist
 try:
     os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -84,12 +296,481 @@ app.config['PROCESSED_FOLDER'] = PROCESSED_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
 
 # Task storage
-tasks = {}
+# Each thread keeps its own SQLite connection; WAL mode lets the status
+# endpoints of every worker read while a processing thread writes.
+_task_db_local = threading.local()
+
+def _task_db():
+    conn = getattr(_task_db_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(TASK_DB_PATH, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        _task_db_local.conn = conn
+    return conn
+
+def init_task_store():
+    """Create the task table if it doesn't exist"""
+    _task_db().execute(
+        'CREATE TABLE IF NOT EXISTS tasks ('
+        'id TEXT PRIMARY KEY, '
+        'data TEXT NOT NULL, '
+        'version INTEGER NOT NULL DEFAULT 0, '
+        'created_at REAL NOT NULL, '
+        'updated_at REAL NOT NULL)'
+    )
+    # Finished letters by upload content hash and pipeline fingerprint
+    _task_db().execute(
+        'CREATE TABLE IF NOT EXISTS results ('
+        'content_hash TEXT NOT NULL, '
+        'fingerprint TEXT NOT NULL, '
+        'entry TEXT NOT NULL, '
+        'output_path TEXT NOT NULL, '
+        'created_at REAL NOT NULL, '
+        'PRIMARY KEY (content_hash, fingerprint))'
+    )
+    # Lets the stale-task scan look at unfinished tasks only
+    _task_db().execute("CREATE INDEX IF NOT EXISTS tasks_status ON tasks (json_extract(data, '$.status'))")
+
+def create_task(task_id, data):
+    """Store a new task record"""
+    now = time.time()
+    _task_db().execute(
+        'INSERT INTO tasks (id, data, version, created_at, updated_at) VALUES (?, ?, 0, ?, ?)',
+        (task_id, json.dumps(data), now, now)
+    )
+
+def get_task(task_id):
+    """Return the task record as a dict, or None if the task doesn't exist"""
+    row = _task_db().execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def update_task(task_id, only_if_status=None, increments=None, **fields):
+    """Atomically merge fields into a task record
+    
+    only_if_status: apply the update only if the task's current status is in this collection
+    increments: dict of numeric fields to add to rather than overwrite
+    Returns the updated record, or None if the task doesn't exist or the status didn't match.
+    """
+    conn = _task_db()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute('SELECT data FROM tasks WHERE id = ?', (task_id,)).fetchone()
+        if row is None:
+            conn.execute('ROLLBACK')
+            return None
+        data = json.loads(row[0])
+        if only_if_status is not None and data.get('status') not in only_if_status:
+            conn.execute('ROLLBACK')
+            return None
+        data.update(fields)
+        for key, amount in (increments or {}).items():
+            data[key] = data.get(key, 0) + amount
+        conn.execute(
+            'UPDATE tasks SET data = ?, version = version + 1, updated_at = ? WHERE id = ?',
+            (json.dumps(data), time.time(), task_id)
+        )
+        conn.execute('COMMIT')
+        return data
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def get_task_version(task_id):
+    """Return the task's version counter (bumped on every update), or None if the task doesn't exist"""
+    row = _task_db().execute('SELECT version FROM tasks WHERE id = ?', (task_id,)).fetchone()
+    return row[0] if row else None
+
+def touch_task(task_id):
+    """Refresh a task's heartbeat without notifying status listeners"""
+    _task_db().execute('UPDATE tasks SET updated_at = ? WHERE id = ?', (time.time(), task_id))
+
+def claim_stale_task(task_id, stale_after):
+    """Atomically take over a queued or processing task whose heartbeat stopped; returns the task or None"""
+    conn = _task_db()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            'SELECT data FROM tasks WHERE id = ? AND updated_at < ?',
+            (task_id, time.time() - stale_after)
+        ).fetchone()
+        data = json.loads(row[0]) if row else None
+        if data is None or data.get('status') not in ('queued', 'processing'):
+            conn.execute('ROLLBACK')
+            return None
+        data['status'] = 'queued'
+        data['message'] = 'Resuming interrupted processing...'
+        conn.execute(
+            'UPDATE tasks SET data = ?, version = version + 1, updated_at = ? WHERE id = ?',
+            (json.dumps(data), time.time(), task_id)
+        )
+        conn.execute('COMMIT')
+        return data
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+def list_stale_task_ids(stale_after):
+    """Ids of queued or processing tasks that haven't been updated for stale_after seconds"""
+    # Finished tasks are never resumed; leaving them out keeps this independent of task history
+    rows = _task_db().execute(
+        "SELECT id FROM tasks WHERE json_extract(data, '$.status') IN ('queued', 'processing') AND updated_at < ?",
+        (time.time() - stale_after,)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def count_tasks_by_status():
+    """Number of tasks in each status"""
+    rows = _task_db().execute(
+        "SELECT json_extract(data, '$.status'), COUNT(*) FROM tasks GROUP BY 1"
+    ).fetchall()
+    return {status or 'unknown': count for status, count in rows}
+
+def delete_task(task_id):
+    """Remove a task record"""
+    _task_db().execute('DELETE FROM tasks WHERE id = ?', (task_id,))
+
+def record_result(content_hash, fingerprint, entry, output_path):
+    """Remember the processed document produced for an upload's content"""
+    _task_db().execute(
+        'INSERT OR REPLACE INTO results (content_hash, fingerprint, entry, output_path, created_at) VALUES (?, ?, ?, ?, ?)',
+        (content_hash, fingerprint, json.dumps(entry), output_path, time.time())
+    )
+
+def find_result(content_hash, fingerprint):
+    """Return the earlier result for this content as {'entry', 'output_path'}, or None if there is none on disk"""
+    row = _task_db().execute(
+        'SELECT entry, output_path FROM results WHERE content_hash = ? AND fingerprint = ?',
+        (content_hash, fingerprint)
+    ).fetchone()
+    if row is None:
+        return None
+    if not os.path.exists(row[1]):
+        # The processed document was removed; forget it so the letter is processed again
+        _task_db().execute(
+            'DELETE FROM results WHERE content_hash = ? AND fingerprint = ?', (content_hash, fingerprint)
+        )
+        return None
+    return {'entry': json.loads(row[0]), 'output_path': row[1]}
+
+class TaskCheckpoint:
+    """Append-only JSON-lines log of a task's finished chunks and files
+    
+    Each completed chunk response and each finished file is appended as one
+    line; reopening the log after an interruption replays it so processing
+    resumes from the first unfinished chunk. A torn final line is ignored.
+    """
+    
+    def __init__(self, task_id):
+        self.path = os.path.join(CHECKPOINT_FOLDER, f"{task_id}.jsonl")
+        self.lock = threading.Lock()
+        self.chunks = {}
+        self.files = {}
+        os.makedirs(CHECKPOINT_FOLDER, exist_ok=True)
+        self._load()
+        self.file = open(self.path, 'a', encoding='utf-8')
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get('type') == 'chunk':
+                    self.chunks[record['key']] = record['text']
+                elif record.get('type') == 'file':
+                    self.files[record['index']] = record
+        logger.info(f"Loaded checkpoint {self.path}: {len(self.chunks)} chunks, {len(self.files)} files")
+    
+    def _append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+    
+    def get_chunk(self, key):
+        return self.chunks.get(key)
+    
+    def record_chunk(self, key, text):
+        self.chunks[key] = text
+        self._append({'type': 'chunk', 'key': key, 'text': text})
+    
+    def get_file(self, index, file_path):
+        record = self.files.get(index)
+        if record and record.get('file_path') == file_path:
+            return record
+        return None
+    
+    def record_file(self, index, file_path, entry, output_path):
+        record = {'type': 'file', 'index': index, 'file_path': file_path, 'entry': entry, 'output_path': output_path}
+        self.files[index] = record
+        self._append(record)
+    
+    def close(self):
+        with self.lock:
+            self.file.close()
+    
+    def discard(self):
+        """Close and delete the checkpoint once the task has completed"""
+        self.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+try:
+    os.makedirs(os.path.dirname(TASK_DB_PATH), exist_ok=True)
+    init_task_store()
+    logger.info(f"Initialized task store at {TASK_DB_PATH}")
+except Exception as e:
+    logger.error(f"Error initializing task store: {str(e)}")
+    logger.error(traceback.format_exc())
 
 # Helper functions
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+UPLOAD_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+def save_upload(stream, max_bytes=None):
+    """Stream an uploaded file to disk while hashing it; identical content is stored only once
+    
+    Returns (path, content hash, size). Uploads are stored as <sha256>.docx.
+    Raises ValueError if the stream is longer than max_bytes.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                block = stream.read(1024 * 1024)
+                if not block:
+                    break
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    raise ValueError(f"File is larger than {max_bytes} bytes")
+                digest.update(block)
+                f.write(block)
+        content_hash = digest.hexdigest()
+        path = os.path.join(UPLOAD_FOLDER, f"{content_hash}.docx")
+        if os.path.exists(path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, path)
+        return path, content_hash, size
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+def is_valid_docx(file_path):
+    """Check that a file is a ZIP package with a Word document part"""
+    try:
+        with zipfile.ZipFile(file_path) as docx_zip:
+            return 'word/document.xml' in docx_zip.namelist()
+    except (zipfile.BadZipFile, OSError):
+        return False
+
+def upload_content_hash(file_path):
+    """Content hash of a stored upload, or None for uploads saved before uploads were hashed"""
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    return stem if UPLOAD_HASH_PATTERN.match(stem) else None
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+    kind = 'counter'
+    
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {}
+    
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+    
+    def samples(self):
+        with self.lock:
+            return [(self.name, dict(zip(self.labels, key)), value) for key, value in self.values.items()]
+
+class Gauge:
+    """Value read from a callback at scrape time (kind='counter' for totals kept elsewhere)"""
+    
+    def __init__(self, name, documentation, callback, labels=(), kind='gauge'):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = labels
+    
+    def samples(self):
+        value = self.callback()
+        if isinstance(value, dict):
+            return [(self.name, dict(zip(self.labels, key if isinstance(key, tuple) else (key,))), v) for key, v in value.items()]
+        return [(self.name, {}, value)]
+
+class Histogram:
+    """Cumulative histogram with fixed buckets, optionally split by label values"""
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, buckets, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = sorted(buckets)
+        self.labels = labels
+        self.lock = threading.Lock()
+        self.values = {}
+    
+    def observe(self, value, **labels):
+        key = tuple(labels.get(label, '') for label in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+    
+    def samples(self):
+        with self.lock:
+            snapshot = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        samples = []
+        for key, counts, total in snapshot:
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + [float('inf')], counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", dict(labels, le='+Inf' if bound == float('inf') else repr(bound)), cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+def _escape_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class MetricsRegistry:
+    """Thread-safe collection of metrics rendered in the Prometheus text format"""
+    
+    def __init__(self):
+        self.metrics = []
+    
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+    
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.warning(f"Error collecting metric {metric.name}: {str(e)}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                # A sample with no value would make Prometheus reject the whole scrape
+                if value is None:
+                    continue
+                if labels:
+                    label_text = ','.join(
+                        f'{key}="{_escape_label(val)}"' for key, val in labels.items()
+                    )
+                    lines.append(f"{name}{{{label_text}}} {value}")
+                else:
+                    lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600]
+
+STAGE_SECONDS = metrics.register(Histogram(
+    'latin_stage_duration_seconds',
+    'Time spent per pipeline stage (extraction, correction, translation, docx, compilation, task)',
+    DURATION_BUCKETS, labels=('stage',)
+))
+UPLOAD_BYTES = metrics.register(Histogram(
+    'latin_upload_size_bytes', 'Size of uploaded files',
+    [10 * 1024, 50 * 1024, 100 * 1024, 500 * 1024, 1024 * 1024, 5 * 1024 * 1024, 16 * 1024 * 1024]
+))
+OPENAI_REQUEST_SECONDS = metrics.register(Histogram(
+    'latin_openai_request_duration_seconds', 'Latency of individual OpenAI chunk requests',
+    DURATION_BUCKETS, labels=('stage', 'outcome')
+))
+OPENAI_RETRIES = metrics.register(Counter(
+    'latin_openai_retries_total', 'Chunk requests retried after an error', labels=('stage',)
+))
+OPENAI_FAILURES = metrics.register(Counter(
+    'latin_openai_chunk_failures_total', 'Chunks that fell back after all retries failed', labels=('stage',)
+))
+OPENAI_HEDGES = metrics.register(Counter(
+    'latin_openai_hedges_total', 'Duplicate requests sent for slow requests, by which copy answered first',
+    labels=('stage', 'winner')
+))
+OPENAI_HEDGES_DENIED = metrics.register(Counter(
+    'latin_openai_hedges_denied_total', 'Slow requests not hedged because the hedge budget was spent', labels=('stage',)
+))
+COMBINED_FALLBACKS = metrics.register(Counter(
+    'latin_combined_fallbacks_total', 'Combined-mode chunks redone with separate correction and translation requests',
+    labels=('reason',)
+))
+OPENAI_TOKENS = metrics.register(Counter(
+    'latin_openai_tokens_total', 'Tokens reported by the OpenAI API', labels=('direction',)
+))
+
+class StageTimings:
+    """Accumulates wall-clock time spent in each pipeline stage"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {}
+    
+    def record(self, stage, seconds):
+        with self.lock:
+            count, total, longest = self.stages.get(stage, (0, 0.0, 0.0))
+            self.stages[stage] = (count + 1, total + seconds, max(longest, seconds))
+    
+    def snapshot(self):
+        with self.lock:
+            return {
+                stage: {'count': count, 'total': total, 'mean': total / count, 'max': longest}
+                for stage, (count, total, longest) in self.stages.items()
+            }
+    
+    def reset(self):
+        with self.lock:
+            self.stages = {}
+
+stage_timings = StageTimings()
+
+@contextmanager
+def timed_stage(stage):
+    """Record the time spent in a block (or decorated function) under the given stage name"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_timings.record(stage, elapsed)
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+
+def timed_async_stage(stage):
+    """Decorator recording the time spent awaiting a coroutine function under the given stage name"""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with timed_stage(stage):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
 # Latin correction prompt template
 LATIN_CORRECTION_PROMPT = """
 You are an expert in early 16th century Latin manuscripts. Your task is to correct transcription errors in the following Latin text while staying very close to the original.
@@ -123,149 +804,1318 @@ Latin text to translate:
 Provide only the Dutch translation without any explanations or comments:
 """
 
-def correct_latin_with_chatgpt(text):
-    """Correct Latin text using ChatGPT"""
+# Combined correction and translation prompt template; the answer is a JSON object
+COMBINED_PROMPT = """
+You are an expert in early 16th century Latin manuscripts and an expert translator of early 16th century Latin to modern Dutch. Correct the transcription errors in the following Latin paragraphs, then translate each corrected paragraph into convivial, accessible Dutch.
+
+Correction guidelines:
+1. Focus only on fixing obvious transcription errors
+2. Preserve period-specific abbreviations and spelling characteristics
+3. Make minimal changes to the text
+4. Do not modernize or standardize the Latin
+5. Preserve the original style and tone
+
+Translation guidelines:
+1. Create natural, conversational Dutch that modern readers can easily understand
+2. Maintain fidelity to the original Latin meaning and tone
+3. Preserve the warmth and personality of the original correspondence
+4. Use accessible language while respecting the historical context
+
+Latin paragraphs, as a JSON array of {count} strings:
+{paragraphs}
+
+Answer with a JSON object of the form {{"paragraphs": [{{"latin": "...", "dutch": "..."}}, ...]}} holding exactly {count} entries, one per Latin paragraph and in the same order. "latin" is the corrected paragraph and "dutch" its translation; keep empty paragraphs empty. Do not add explanations or comments.
+"""
+
+def pipeline_fingerprint(combined=False):
+    """Identifies the model, prompts, processing mode and extraction settings a processed document was
+    made with; stored results are only reused for uploads processed the same way"""
+    # Pipelined and separate processing send the same prompts, so they share a fingerprint
+    prompts = ['combined', COMBINED_PROMPT] if combined else ['separate', LATIN_CORRECTION_PROMPT, DUTCH_TRANSLATION_PROMPT]
+    return hashlib.sha256(json.dumps(
+        [OPENAI_MODEL, *prompts, EXTRACT_TABLE_TEXT, EXTRACT_NOTE_TEXT]
+    ).encode('utf-8')).hexdigest()
+
+# Text the pipeline puts in place of a translation it couldn't produce; documents containing
+# any of these are not stored for reuse. Failed corrections leave the Latin as it was, so
+# they are reported through the failures list of the correction functions instead
+FALLBACK_MARKERS = ('[ERROR IN TRANSLATION]', '[DUTCH TRANSLATION PLACEHOLDER]', '[TRANSLATION ERROR FOR:')
+
+class ResponseCache:
+    """Disk-backed, size-bounded LRU cache of model responses keyed on a content hash
+    
+    Also holds rendered preview pages, in a separate folder (label names the cache in log messages).
+    """
+    
+    def __init__(self, folder, max_bytes, label='response cache'):
+        self.label = label
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.total_bytes = None
+    
+    @staticmethod
+    def make_key(prompt_template, text, model, temperature, system_prompt=''):
+        """Hash everything that determines the model's answer"""
+        payload = json.dumps([prompt_template, system_prompt, text, model, temperature], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.folder, key[:2], f"{key}.json")
+    
+    def _entries(self):
+        """List (mtime, size, path) for every cache file"""
+        entries = []
+        if not os.path.isdir(self.folder):
+            return entries
+        for subdir in os.scandir(self.folder):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.endswith('.json'):
+                    try:
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    except FileNotFoundError:
+                        pass
+        return entries
+    
+    def get(self, key):
+        """Return the cached response for key, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                response = json.load(f)['response']
+            # Touch the entry so eviction treats it as recently used
+            os.utime(path, None)
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+        except Exception as e:
+            logger.warning(f"Error reading {self.label} entry {key}: {str(e)}")
+            with self.lock:
+                self.misses += 1
+            return None
+        
+        with self.lock:
+            self.hits += 1
+        return response
+    
+    def put(self, key, response):
+        """Store a response, evicting least recently used entries when over the size limit"""
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = json.dumps({'response': response, 'created': time.time()}, ensure_ascii=False).encode('utf-8')
+            # Write to a temporary file first so readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Error writing {self.label} entry {key}: {str(e)}")
+            return
+        
+        with self.lock:
+            self.total_bytes = self._total_bytes() + len(data)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+    
+    def _total_bytes(self):
+        """Bytes on disk; the cache folder is scanned once per process, on first need"""
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, size, _ in self._entries())
+        return self.total_bytes
+    
+    def _evict(self):
+        """Delete the oldest entries until the cache is at 90% of its size limit"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+        self.total_bytes = total
+        logger.info(f"Evicted {self.label} down to {total} bytes")
+    
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': RESPONSE_CACHE_ENABLED,
+                'folder': self.folder,
+                'max_bytes': self.max_bytes,
+                'total_bytes': self._total_bytes(),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+response_cache = ResponseCache(RESPONSE_CACHE_FOLDER, RESPONSE_CACHE_MAX_BYTES)
+preview_cache = ResponseCache(PREVIEW_CACHE_FOLDER, PREVIEW_CACHE_MAX_BYTES, label='preview cache')
+
+def estimate_tokens(text):
+    """Estimate the number of tokens in a piece of text"""
+    return int(math.ceil(len(text) / CHARS_PER_TOKEN))
+
+def chunk_token_budget(prompt_template, output_ratio=1.0, max_output_tokens=None):
+    """Largest chunk (in tokens) whose prompt fits the context and whose answer fits max_tokens"""
+    max_output_tokens = max_output_tokens or MAX_OUTPUT_TOKENS
+    prompt_tokens = estimate_tokens(prompt_template) + 50  # system message and chat overhead
+    context_budget = MODEL_CONTEXT_TOKENS - max_output_tokens - prompt_tokens
+    output_budget = int(max_output_tokens * CHUNK_OUTPUT_FILL / output_ratio)
+    return max(1, min(context_budget, output_budget))
+
+def correction_chunk_budget():
+    """Token budget for a correction chunk (corrected Latin is about as long as the input)"""
+    return chunk_token_budget(LATIN_CORRECTION_PROMPT, output_ratio=1.0)
+
+def translation_chunk_budget():
+    """Token budget for a translation chunk (Dutch output runs longer than the Latin input)"""
+    return chunk_token_budget(DUTCH_TRANSLATION_PROMPT, output_ratio=1.3)
+
+def pipelined_chunk_budget():
+    """Token budget for a chunk that is corrected and then translated as a whole"""
+    return min(correction_chunk_budget(), translation_chunk_budget())
+
+def combined_chunk_budget():
+    """Token budget for a combined chunk (the answer holds the Latin and the Dutch, plus JSON quoting)"""
+    return chunk_token_budget(COMBINED_PROMPT, output_ratio=2.5, max_output_tokens=COMBINED_MAX_OUTPUT_TOKENS)
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?;:])\s+')
+
+def _split_oversized(paragraph, max_tokens):
+    """Split a paragraph that exceeds the budget into sentence (or, failing that, word) pieces"""
+    pieces = []
+    for sentence in SENTENCE_BOUNDARY.split(paragraph):
+        if estimate_tokens(sentence) <= max_tokens:
+            pieces.append(sentence)
+            continue
+        # A single sentence over budget: fall back to word boundaries
+        words = []
+        for word in sentence.split(' '):
+            while estimate_tokens(word) > max_tokens:
+                # Pathological unbroken run of characters
+                cut = int(max_tokens * CHARS_PER_TOKEN)
+                pieces.append(word[:cut])
+                word = word[cut:]
+            words.append(word)
+        pieces.extend(words)
+    
+    # Greedily pack the pieces back together, separated by spaces
+    packed = []
+    current = ''
+    for piece in pieces:
+        candidate = f"{current} {piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            packed.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        packed.append(current)
+    return packed
+
+def plan_chunks(text, max_tokens):
+    """Pack whole paragraphs into chunks of at most max_tokens estimated tokens
+    
+    Paragraphs are only split (at sentence, then word boundaries) when a single
+    paragraph exceeds the budget. Joining the chunks with newlines restores the
+    original text whenever no paragraph had to be split.
+    """
+    if not text:
+        return []
+    
+    chunks = []
+    current = []
+    current_tokens = 0
+    for paragraph in text.split('\n'):
+        paragraph_tokens = estimate_tokens(paragraph) + 1  # newline separator
+        if paragraph_tokens > max_tokens:
+            if current:
+                chunks.append('\n'.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_split_oversized(paragraph, max_tokens))
+            continue
+        if current and current_tokens + paragraph_tokens > max_tokens:
+            chunks.append('\n'.join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        current_tokens += paragraph_tokens
+    if current:
+        chunks.append('\n'.join(current))
+    return chunks
+
+class RateLimitScheduler:
+    """Process-wide token buckets for OpenAI requests/min and tokens/min with adaptive backoff
+    
+    Callers reserve capacity before each request and are told how long to wait.
+    Reservations are granted in arrival order, so waiting callers form a queue.
+    A 429 halves the effective rate and pauses everyone until Retry-After has
+    passed; each success recovers some of the rate.
+    """
+    
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.lock = threading.Lock()
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rate_factor = 1.0
+        self.request_bucket = float(requests_per_minute)
+        self.token_bucket = float(tokens_per_minute)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+    
+    def _refill(self, now):
+        elapsed = now - self.updated
+        self.updated = now
+        self.request_bucket = min(
+            self.requests_per_minute * self.rate_factor,
+            self.request_bucket + elapsed * self.requests_per_minute * self.rate_factor / 60
+        )
+        self.token_bucket = min(
+            self.tokens_per_minute * self.rate_factor,
+            self.token_bucket + elapsed * self.tokens_per_minute * self.rate_factor / 60
+        )
+    
+    def reserve(self, tokens):
+        """Take capacity for one request of about `tokens` tokens; return seconds to wait before sending"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.request_bucket -= 1
+            self.token_bucket -= tokens
+            delay = max(
+                self.paused_until - now,
+                -self.request_bucket * 60 / (self.requests_per_minute * self.rate_factor),
+                -self.token_bucket * 60 / (self.tokens_per_minute * self.rate_factor),
+                0.0
+            )
+            self.requests += 1
+            self.total_wait += delay
+            return delay
+    
+    async def acquire(self, tokens):
+        """Wait, without blocking the event loop, until a request of about `tokens` tokens may be sent"""
+        delay = self.reserve(tokens)
+        if delay > 0:
+            with self.lock:
+                self.waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                with self.lock:
+                    self.waiting -= 1
+        with self.lock:
+            self.in_flight += 1
+    
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+    
+    def record_success(self):
+        with self.lock:
+            self.rate_factor = min(1.0, self.rate_factor + 0.05)
+    
+    def record_rate_limit(self, retry_after=None):
+        """Slow down after a 429 and pause all requests until Retry-After has passed"""
+        with self.lock:
+            now = time.monotonic()
+            self.rate_limited += 1
+            # 429s from requests that were already in flight belong to the same
+            # burst; only slow down once per backoff period
+            if now >= self.paused_until:
+                self.rate_factor = max(0.1, self.rate_factor * 0.5)
+            pause = retry_after if retry_after is not None else 60 / (self.requests_per_minute * self.rate_factor)
+            self.paused_until = max(self.paused_until, now + pause)
+            logger.warning(f"OpenAI rate limit hit; pausing {pause:.1f}s, rate factor now {self.rate_factor:.2f}")
+    
+    def stats(self):
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'requests_per_minute': self.requests_per_minute,
+                'tokens_per_minute': self.tokens_per_minute,
+                'rate_factor': round(self.rate_factor, 3),
+                'paused_for': round(max(0.0, self.paused_until - now), 2),
+                'request_bucket': round(self.request_bucket, 1),
+                'token_bucket': round(self.token_bucket, 1),
+                'waiting': self.waiting,
+                'in_flight': self.in_flight,
+                'requests': self.requests,
+                'rate_limited': self.rate_limited,
+                'average_wait': round(self.total_wait / self.requests, 3) if self.requests else 0.0
+            }
+
+openai_scheduler = RateLimitScheduler(OPENAI_REQUESTS_PER_MINUTE, OPENAI_TOKENS_PER_MINUTE)
+
+metrics.register(Gauge(
+    'latin_openai_requests_waiting', 'Requests waiting for rate-limit capacity',
+    lambda: openai_scheduler.stats()['waiting']
+))
+metrics.register(Gauge(
+    'latin_openai_requests_in_flight', 'OpenAI requests currently in flight',
+    lambda: openai_scheduler.stats()['in_flight']
+))
+metrics.register(Gauge(
+    'latin_openai_rate_factor', 'Fraction of the configured rate limit currently in use after 429 backoff',
+    lambda: openai_scheduler.stats()['rate_factor']
+))
+metrics.register(Gauge(
+    'latin_response_cache_events_total', 'Response cache hits, misses and evictions',
+    lambda: {event: response_cache.stats()[event] for event in ('hits', 'misses', 'evictions')},
+    labels=('event',), kind='counter'
+))
+metrics.register(Gauge(
+    'latin_response_cache_bytes', 'Bytes stored in the response cache',
+    lambda: response_cache.stats()['total_bytes']
+))
+metrics.register(Gauge(
+    'latin_log_records_dropped_total', 'Log records dropped because the log queue was full',
+    lambda: log_queue_handler.dropped, kind='counter'
+))
+metrics.register(Gauge(
+    'latin_tasks', 'Tasks in the task store by status', count_tasks_by_status, labels=('status',)
+))
+metrics.register(Gauge(
+    'latin_task_queue', 'Tasks of this worker running or waiting for a runner thread',
+    lambda: {state: task_queue.stats()[state] for state in ('active', 'queued')}, labels=('state',)
+))
+metrics.register(Gauge(
+    'latin_request_queue', 'Chunk requests holding or waiting for a fair-share slot',
+    lambda: {state: request_queue.stats()[state] for state in ('in_flight', 'waiting')}, labels=('state',)
+))
+
+class FairRequestQueue:
+    """Caps chunk requests in flight across tasks and hands free slots out fairly
+    
+    Waiting requests are queued per task. A freed slot goes to the highest
+    priority level with waiters, and round-robin between the tasks of that
+    level, so each task gets one request in turn however many it has queued.
+    Used from coroutines on the OpenAI client loop.
+    """
+    
+    def __init__(self, capacity):
+        self.lock = threading.Lock()
+        self.capacity = capacity
+        self.in_flight = 0
+        self.waiting = {}  # task id -> deque of futures
+        self.rotations = {}  # priority -> deque of task ids with waiters
+    
+    async def acquire(self, task_id, priority):
+        with self.lock:
+            if self.in_flight < self.capacity and not self.waiting:
+                self.in_flight += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            if task_id not in self.waiting:
+                self.waiting[task_id] = deque()
+                self.rotations.setdefault(priority, deque()).append(task_id)
+            self.waiting[task_id].append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self.lock:
+                granted = future.done() and not future.cancelled()
+            if granted:
+                self.release()
+            raise
+    
+    def _next_waiter(self):
+        for priority in sorted(self.rotations, reverse=True):
+            rotation = self.rotations[priority]
+            while rotation:
+                task_id = rotation.popleft()
+                waiters = self.waiting[task_id]
+                future = waiters.popleft()
+                if waiters:
+                    rotation.append(task_id)
+                else:
+                    del self.waiting[task_id]
+                if not future.done():
+                    return future
+            del self.rotations[priority]
+        return None
+    
+    def release(self):
+        with self.lock:
+            future = self._next_waiter()
+            if future is not None:
+                # The slot passes straight to the next request
+                future.set_result(None)
+            else:
+                self.in_flight -= 1
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'capacity': self.capacity,
+                'in_flight': self.in_flight,
+                'waiting': sum(len(waiters) for waiters in self.waiting.values()),
+                'waiting_tasks': len(self.waiting)
+            }
+
+request_queue = FairRequestQueue(MAX_IN_FLIGHT_REQUESTS)
+
+class HedgePolicy:
+    """Decides when a slow request gets a duplicate, from recent latencies per stage
+    
+    The hedge delay is a percentile of the stage's last few hundred successful
+    request latencies. Hedges are paid for from a token bucket that every
+    request adds `budget` tokens to, so they stay under that fraction of all
+    requests, with a small allowance for bursts.
+    """
+    
+    window = 200
+    max_tokens = 10.0
+    
+    def __init__(self, percentile, min_delay, budget, min_samples):
+        self.lock = threading.Lock()
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.budget = budget
+        self.min_samples = min_samples
+        self.latencies = {}  # stage -> deque of recent latencies
+        self.tokens = 0.0
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.denied = 0
+    
+    def record_latency(self, stage, seconds):
+        with self.lock:
+            self.latencies.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+    
+    def record_request(self):
+        with self.lock:
+            self.requests += 1
+            self.tokens = min(self.max_tokens, self.tokens + self.budget)
+    
+    def _delay(self, stage):
+        samples = self.latencies.get(stage)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile))])
+    
+    def delay(self, stage):
+        """Seconds to wait for an answer before hedging, or None while there are too few samples"""
+        with self.lock:
+            return self._delay(stage)
+    
+    def try_hedge(self):
+        """Spend a hedge from the budget; False when it is used up"""
+        with self.lock:
+            if self.tokens < 1:
+                self.denied += 1
+                return False
+            self.tokens -= 1
+            self.hedges += 1
+            return True
+    
+    def record_win(self, hedge_won):
+        with self.lock:
+            if hedge_won:
+                self.hedge_wins += 1
+    
+    def stats(self):
+        with self.lock:
+            return {
+                'enabled': HEDGE_REQUESTS,
+                'requests': self.requests,
+                'hedges': self.hedges,
+                'hedge_rate': round(self.hedges / self.requests, 4) if self.requests else 0.0,
+                'hedge_wins': self.hedge_wins,
+                'denied': self.denied,
+                'budget_tokens': round(self.tokens, 2),
+                'delays': {stage: self._delay(stage) for stage in self.latencies}
+            }
+
+hedge_policy = HedgePolicy(HEDGE_PERCENTILE, HEDGE_MIN_DELAY, HEDGE_BUDGET, HEDGE_MIN_SAMPLES)
+
+# (task id, priority) of the task whose chunks are being processed; set by dispatch_chunks
+current_job = contextvars.ContextVar('current_job', default=(None, TASK_PRIORITIES['normal']))
+
+class OpenAIClientLoop:
+    """Event loop thread owning the process's single AsyncOpenAI client
+    
+    Processing threads hand their chunk coroutines to run(), so every request
+    in the process shares one loop and one pool of keep-alive connections.
+    The loop is started on first use, after gunicorn has forked the worker.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.loop = None
+        self.client = None
+        self.pid = None
+    
+    def _get_loop(self):
+        with self.lock:
+            # Threads don't survive a fork, so a child process starts its own loop
+            if self.loop is None or self.pid != os.getpid():
+                self.loop = asyncio.new_event_loop()
+                self.client = None
+                self.pid = os.getpid()
+                threading.Thread(target=self.loop.run_forever, name='openai-loop', daemon=True).start()
+                logger.info("Started OpenAI client event loop")
+            return self.loop
+    
+    def get_client(self):
+        """The shared AsyncOpenAI client; only call from coroutines running on the loop"""
+        if self.client is None:
+            self.client = openai.AsyncOpenAI(
+                api_key=os.environ.get('OPENAI_API_KEY'),
+                timeout=OPENAI_TIMEOUT,
+                # The scheduler handles 429s itself, so the client must not retry them behind its back
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=OPENAI_MAX_CONNECTIONS,
+                        max_keepalive_connections=OPENAI_KEEPALIVE_CONNECTIONS,
+                        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+                    )
+                )
+            )
+        return self.client
+    
+    def run(self, coro):
+        """Run a coroutine on the client loop and block the calling thread until it finishes"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop()).result()
+
+openai_client = OpenAIClientLoop()
+
+def retry_after_seconds(error):
+    """Read Retry-After (or retry-after-ms) from an OpenAI error response, if present"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+async def request_chat_completion(system_prompt, prompt, temperature, stage='unknown', response_format=None,
+                                  max_tokens=None):
+    """Send one chat completion request through the fair request queue and the rate-limit scheduler"""
+    await request_queue.acquire(*current_job.get())
+    try:
+        send = functools.partial(
+            _request_chat_completion, system_prompt, prompt, temperature, stage, response_format,
+            max_tokens or MAX_OUTPUT_TOKENS
+        )
+        if HEDGE_REQUESTS:
+            return await send_hedged(send, stage)
+        return await send()
+    finally:
+        request_queue.release()
+
+async def send_hedged(send, stage):
+    """Await send(), sending a duplicate if the answer is slow by the hedge policy; first answer wins
+    
+    The duplicate shares the original's fair-queue slot but goes through the
+    rate-limit scheduler like any other request.
+    """
+    hedge_policy.record_request()
+    sent = asyncio.Event()
+    primary = asyncio.ensure_future(send(sent))
+    hedge = None
+    try:
+        # Time the hedge from when the request went out, not from its wait in the scheduler
+        waiter = asyncio.ensure_future(sent.wait())
+        await asyncio.wait({primary, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+        delay = hedge_policy.delay(stage)
+        if delay is None:
+            return await primary
+        await asyncio.wait({primary}, timeout=delay)
+        if primary.done():
+            return primary.result()
+        if not hedge_policy.try_hedge():
+            OPENAI_HEDGES_DENIED.inc(stage=stage)
+            return await primary
+        
+        logger.info(f"No {stage} answer after {delay:.1f}s, sending a hedged request")
+        hedge = asyncio.ensure_future(send())
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    OPENAI_HEDGES.inc(stage=stage, winner='hedge' if task is hedge else 'primary')
+                    hedge_policy.record_win(task is hedge)
+                    return task.result()
+                if error is None or task is primary:
+                    error = task.exception()
+        OPENAI_HEDGES.inc(stage=stage, winner='none')
+        raise error
+    finally:
+        # The slower copy is cancelled once an answer is in (or the caller gave up)
+        for task in (primary, hedge):
+            if task is not None and not task.done():
+                task.cancel()
+
+async def _request_chat_completion(system_prompt, prompt, temperature, stage, response_format, max_tokens, sent=None):
+    # OpenAI counts the prompt plus max_tokens against the tokens/min limit
+    await openai_scheduler.acquire(estimate_tokens(system_prompt + prompt) + max_tokens)
+    if sent is not None:
+        sent.set()
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        response = await openai_client.get_client().chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            response_format=response_format or openai.NOT_GIVEN
+        )
+        outcome = 'ok'
+    except openai.RateLimitError as e:
+        outcome = 'rate_limited'
+        openai_scheduler.record_rate_limit(retry_after_seconds(e))
+        raise
+    except asyncio.CancelledError:
+        # The other copy of a hedged request answered first
+        outcome = 'cancelled'
+        raise
+    finally:
+        openai_scheduler.release()
+        OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - start, stage=stage, outcome=outcome)
+    
+    openai_scheduler.record_success()
+    hedge_policy.record_latency(stage, time.perf_counter() - start)
+    if response.usage:
+        OPENAI_TOKENS.inc(response.usage.prompt_tokens, direction='in')
+        OPENAI_TOKENS.inc(response.usage.completion_tokens, direction='out')
+    return response.choices[0].message.content.strip()
+
+async def dispatch_chunks(chunks, process_chunk, max_in_flight=None, job=None):
+    """Await process_chunk over all chunks with bounded concurrency, keeping chunk order
+    
+    job is the (task id, priority) the chunk requests are queued under.
+    """
+    if job is not None:
+        # Chunk coroutines inherit the context, so their requests are queued under this task
+        current_job.set(job)
+    if max_in_flight is None:
+        max_in_flight = MAX_CONCURRENT_CHUNKS
+    max_in_flight = max(1, min(int(max_in_flight), len(chunks)))
+    
+    logger.info(f"Dispatching {len(chunks)} chunks with up to {max_in_flight} requests in flight")
+    semaphore = asyncio.Semaphore(max_in_flight)
+    
+    async def run_chunk(i, chunk):
+        async with semaphore:
+            return await process_chunk(i, chunk, len(chunks))
+    
+    # gather returns results in submission order, regardless of completion order
+    return await asyncio.gather(*(run_chunk(i, chunk) for i, chunk in enumerate(chunks)))
+
+@timed_async_stage('correction')
+async def correct_latin_chunk(i, chunk, total_chunks, checkpoint=None, failures=None):
+    """Correct a single chunk of Latin text, falling back to the original chunk on failure
+    
+    A chunk that fell back is noted in failures, if given.
+    """
+    logger.info(f"Processing chunk {i+1}/{total_chunks}")
+    system_prompt = "You are an expert in early 16th century Latin manuscripts."
+    temperature = 0.3
+    
+    # Chunks finished before an interruption are taken from the task checkpoint
+    cache_key = ResponseCache.make_key(LATIN_CORRECTION_PROMPT, chunk, OPENAI_MODEL, temperature, system_prompt)
+    if checkpoint:
+        done = checkpoint.get_chunk(cache_key)
+        if done is not None:
+            logger.info(f"Using checkpointed correction for chunk {i+1}")
+            return done
+    
+    # Serve repeated chunks from the response cache without calling the API; cache and
+    # checkpoint files are read and written off the client loop, which every task's chunks share
+    if RESPONSE_CACHE_ENABLED:
+        cached = await asyncio.to_thread(response_cache.get, cache_key)
+        if cached is not None:
+            logger.info(f"Using cached correction for chunk {i+1}")
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.record_chunk, cache_key, cached)
+            return cached
+    
+    # Prepare the prompt
+    prompt = LATIN_CORRECTION_PROMPT.format(latin_text=chunk)
+    
+    # Make API call with retry logic
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"Making OpenAI API call for Latin correction (attempt {attempt+1}/{max_retries})")
+            corrected_text = await request_chat_completion(system_prompt, prompt, temperature, stage='correction')
+            logger.info(f"Successfully received corrected text for chunk {i+1}")
+            if RESPONSE_CACHE_ENABLED:
+                await asyncio.to_thread(response_cache.put, cache_key, corrected_text)
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.record_chunk, cache_key, corrected_text)
+            return corrected_text
+        except Exception as e:
+            logger.error(f"Error in ChatGPT API call (attempt {attempt+1}/{max_retries}): {str(e)}")
+            logger.error(traceback.format_exc())
+            if attempt == max_retries - 1:
+                logger.warning(f"All retries failed for chunk {i+1}, using original text")
+                OPENAI_FAILURES.inc(stage='correction')
+                if failures is not None:
+                    failures.append('correction')
+                return chunk
+            OPENAI_RETRIES.inc(stage='correction')
+            if not isinstance(e, openai.RateLimitError):
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            # Rate-limited retries wait in the scheduler, which honours Retry-After
+
+@timed_async_stage('translation')
+async def translate_dutch_chunk(i, chunk, total_chunks, checkpoint=None, failures=None):
+    """Translate a single chunk of Latin text, falling back to a placeholder on failure
+    
+    A chunk that fell back is noted in failures, if given.
+    """
+    logger.info(f"Translating chunk {i+1}/{total_chunks}")
+    system_prompt = "You are an expert translator of early 16th century Latin to modern Dutch."
+    temperature = 0.4
+    
+    # Chunks finished before an interruption are taken from the task checkpoint
+    cache_key = ResponseCache.make_key(DUTCH_TRANSLATION_PROMPT, chunk, OPENAI_MODEL, temperature, system_prompt)
+    if checkpoint:
+        done = checkpoint.get_chunk(cache_key)
+        if done is not None:
+            logger.info(f"Using checkpointed translation for chunk {i+1}")
+            return done
+    
+    # Serve repeated chunks from the response cache without calling the API; cache and
+    # checkpoint files are read and written off the client loop, which every task's chunks share
+    if RESPONSE_CACHE_ENABLED:
+        cached = await asyncio.to_thread(response_cache.get, cache_key)
+        if cached is not None:
+            logger.info(f"Using cached translation for chunk {i+1}")
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.record_chunk, cache_key, cached)
+            return cached
+    
+    # Prepare the prompt
+    prompt = DUTCH_TRANSLATION_PROMPT.format(latin_text=chunk)
+    
+    # Make API call with retry logic
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"Making OpenAI API call for Dutch translation (attempt {attempt+1}/{max_retries})")
+            translated_text = await request_chat_completion(system_prompt, prompt, temperature, stage='translation')
+            logger.info(f"Successfully received translation for chunk {i+1}")
+            if RESPONSE_CACHE_ENABLED:
+                await asyncio.to_thread(response_cache.put, cache_key, translated_text)
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.record_chunk, cache_key, translated_text)
+            return translated_text
+        except Exception as e:
+            logger.error(f"Error in ChatGPT API call (attempt {attempt+1}/{max_retries}): {str(e)}")
+            logger.error(traceback.format_exc())
+            if attempt == max_retries - 1:
+                logger.warning(f"All retries failed for chunk {i+1}, using placeholder")
+                OPENAI_FAILURES.inc(stage='translation')
+                if failures is not None:
+                    failures.append('translation')
+                return f"[TRANSLATION ERROR FOR: {chunk[:100]}...]"
+            OPENAI_RETRIES.inc(stage='translation')
+            if not isinstance(e, openai.RateLimitError):
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            # Rate-limited retries wait in the scheduler, which honours Retry-After
+
+def parse_combined_response(answer, paragraphs):
+    """Validate a combined answer against its input paragraphs; return (latin, dutch) paragraph lists
+    
+    Raises ValueError when the answer is not the expected JSON or doesn't line up with the input.
+    """
+    try:
+        data = json.loads(answer)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"answer is not valid JSON ({e})")
+    entries = data.get('paragraphs') if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError("answer has no paragraphs list")
+    if len(entries) != len(paragraphs):
+        raise ValueError(f"answer has {len(entries)} paragraphs, expected {len(paragraphs)}")
+    
+    latin, dutch = [], []
+    for n, (entry, paragraph) in enumerate(zip(entries, paragraphs)):
+        if not isinstance(entry, dict) or not isinstance(entry.get('latin'), str) or not isinstance(entry.get('dutch'), str):
+            raise ValueError(f"paragraph {n+1} lacks latin and dutch strings")
+        if paragraph.strip() and not (entry['latin'].strip() and entry['dutch'].strip()):
+            raise ValueError(f"paragraph {n+1} came back empty")
+        # A line break inside a paragraph would shift the alignment of every row after it
+        latin.append(' '.join(entry['latin'].splitlines()))
+        dutch.append(' '.join(entry['dutch'].splitlines()))
+    return latin, dutch
+
+@timed_async_stage('combined')
+async def correct_and_translate_chunk(i, chunk, total_chunks, checkpoint=None, failures=None):
+    """Correct and translate a chunk with one JSON request; returns (corrected chunk, translated chunk)
+    
+    Falls back to separate correction and translation requests when the
+    request fails or its answer doesn't validate.
+    """
+    logger.info(f"Correcting and translating chunk {i+1}/{total_chunks} in one request")
+    system_prompt = "You are an expert in early 16th century Latin manuscripts and their translation to modern Dutch. You answer in JSON."
+    temperature = 0.3
+    paragraphs = chunk.split('\n')
+    
+    # Chunks finished before an interruption are taken from the task checkpoint,
+    # and repeated chunks from the response cache; both only hold validated answers. Their
+    # files are read and written off the client loop, which every task's chunks share
+    cache_key = ResponseCache.make_key(COMBINED_PROMPT, chunk, OPENAI_MODEL, temperature, system_prompt)
+    answer = checkpoint.get_chunk(cache_key) if checkpoint else None
+    if answer is not None:
+        logger.info(f"Using checkpointed combined answer for chunk {i+1}")
+    elif RESPONSE_CACHE_ENABLED:
+        answer = await asyncio.to_thread(response_cache.get, cache_key)
+        if answer is not None:
+            logger.info(f"Using cached combined answer for chunk {i+1}")
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.record_chunk, cache_key, answer)
+    if answer is not None:
+        latin, dutch = parse_combined_response(answer, paragraphs)
+        return '\n'.join(latin), '\n'.join(dutch)
+    
+    # Prepare the prompt
+    prompt = COMBINED_PROMPT.format(count=len(paragraphs), paragraphs=json.dumps(paragraphs, ensure_ascii=False))
+    
+    # Make API call with retry logic
+    max_retries = 3
+    for attempt in range(max_retries):
+        try:
+            logger.info(f"Making OpenAI API call for combined correction and translation (attempt {attempt+1}/{max_retries})")
+            answer = await request_chat_completion(
+                system_prompt, prompt, temperature, stage='combined', response_format={'type': 'json_object'},
+                max_tokens=COMBINED_MAX_OUTPUT_TOKENS
+            )
+            latin, dutch = parse_combined_response(answer, paragraphs)
+            logger.info(f"Successfully received combined answer for chunk {i+1}")
+            if RESPONSE_CACHE_ENABLED:
+                await asyncio.to_thread(response_cache.put, cache_key, answer)
+            if checkpoint:
+                await asyncio.to_thread(checkpoint.record_chunk, cache_key, answer)
+            return '\n'.join(latin), '\n'.join(dutch)
+        except ValueError as e:
+            # A malformed answer is not retried; the two-request path is more dependable
+            logger.warning(f"Unusable combined answer for chunk {i+1}: {str(e)}")
+            COMBINED_FALLBACKS.inc(reason='invalid')
+            break
+        except Exception as e:
+            logger.error(f"Error in ChatGPT API call (attempt {attempt+1}/{max_retries}): {str(e)}")
+            logger.error(traceback.format_exc())
+            if attempt == max_retries - 1:
+                OPENAI_FAILURES.inc(stage='combined')
+                COMBINED_FALLBACKS.inc(reason='failed')
+                break
+            OPENAI_RETRIES.inc(stage='combined')
+            if not isinstance(e, openai.RateLimitError):
+                await asyncio.sleep(2 ** attempt)  # Exponential backoff
+            # Rate-limited retries wait in the scheduler, which honours Retry-After
+    
+    logger.warning(f"Falling back to separate correction and translation for chunk {i+1}")
+    corrected_chunk = await correct_latin_chunk(i, chunk, total_chunks, checkpoint, failures)
+    translated_chunk = await translate_dutch_chunk(i, corrected_chunk, total_chunks, checkpoint, failures)
+    return corrected_chunk, translated_chunk
+
+def correct_latin_with_chatgpt(text, max_in_flight=None, checkpoint=None, job=None, failures=None):
+    """Correct Latin text using ChatGPT
+    
+    failures, if given, collects the stage of every part that fell back to placeholder or uncorrected text.
+    """
     try:
         logger.info("Starting Latin correction")
         # Check if OPENAI_API_KEY is set
         api_key = os.environ.get('OPENAI_API_KEY')
         if not api_key:
             logger.warning("OPENAI_API_KEY not set, using placeholder correction")
+            if failures is not None:
+                failures.append('correction')
             return text + " [CORRECTED]"
         
         logger.info("OpenAI API key is set")
-        openai.api_key = api_key
         
-        # Split text into manageable chunks (4000 characters)
-        chunks = []
-        chunk_size = 4000
-        for i in range(0, len(text), chunk_size):
-            chunks.append(text[i:i+chunk_size])
+        # Split text into paragraph-aligned chunks within the token budget
+        chunks = plan_chunks(text, correction_chunk_budget())
         
         logger.info(f"Split text into {len(chunks)} chunks for processing")
         
-        corrected_chunks = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}")
-            # Prepare the prompt
-            prompt = LATIN_CORRECTION_PROMPT.format(latin_text=chunk)
-            
-            # Make API call with retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Making OpenAI API call for Latin correction (attempt {attempt+1}/{max_retries})")
-                    response = openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=[
-                            {"role": "system", "content": "You are an expert in early 16th century Latin manuscripts."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.3,
-                        max_tokens=4000,
-                        timeout=30
-                    )
-                    
-                    corrected_text = response.choices[0].message.content.strip()
-                    logger.info(f"Successfully received corrected text for chunk {i+1}")
-                    corrected_chunks.append(corrected_text)
-                    break
-                except Exception as e:
-                    logger.error(f"Error in ChatGPT API call (attempt {attempt+1}/{max_retries}): {str(e)}")
-                    logger.error(traceback.format_exc())
-                    if attempt == max_retries - 1:
-                        logger.warning(f"All retries failed for chunk {i+1}, using original text")
-                        corrected_chunks.append(chunk)
-                    else:
-                        time.sleep(2 ** attempt)  # Exponential backoff
+        corrected_chunks = openai_client.run(
+            dispatch_chunks(
+                chunks, functools.partial(correct_latin_chunk, checkpoint=checkpoint, failures=failures), max_in_flight, job
+            )
+        )
         
         logger.info("Latin correction completed successfully")
         return "\n".join(corrected_chunks)
     except Exception as e:
         logger.error(f"Error in Latin correction: {str(e)}")
         logger.error(traceback.format_exc())
+        if failures is not None:
+            failures.append('correction')
         return text + " [ERROR IN CORRECTION]"
 
-def translate_latin_to_dutch_with_chatgpt(text):
-    """Translate Latin text to Dutch using ChatGPT"""
+def translate_latin_to_dutch_with_chatgpt(text, max_in_flight=None, checkpoint=None, job=None, failures=None):
+    """Translate Latin text to Dutch using ChatGPT
+    
+    failures, if given, collects the stage of every part that fell back to a placeholder.
+    """
     try:
         logger.info("Starting Dutch translation")
         # Check if OPENAI_API_KEY is set
         api_key = os.environ.get('OPENAI_API_KEY')
         if not api_key:
             logger.warning("OPENAI_API_KEY not set, using placeholder translation")
+            if failures is not None:
+                failures.append('translation')
             return "[DUTCH TRANSLATION PLACEHOLDER]"
         
         logger.info("OpenAI API key is set")
-        openai.api_key = api_key
         
-        # Split text into manageable chunks (3000 characters)
-        chunks = []
-        chunk_size = 3000
-        for i in range(0, len(text), chunk_size):
-            chunks.append(text[i:i+chunk_size])
+        # Split text into paragraph-aligned chunks within the token budget
+        chunks = plan_chunks(text, translation_chunk_budget())
+        
+        logger.info(f"Split text into {len(chunks)} chunks for translation")
+        
+        translated_chunks = openai_client.run(
+            dispatch_chunks(
+                chunks, functools.partial(translate_dutch_chunk, checkpoint=checkpoint, failures=failures), max_in_flight, job
+            )
+        )
+        
+        logger.info("Dutch translation completed successfully")
+        return "\n".join(translated_chunks)
+    except Exception as e:
+        logger.error(f"Error in Dutch translation: {str(e)}")
+        logger.error(traceback.format_exc())
+        if failures is not None:
+            failures.append('translation')
+        return "[ERROR IN TRANSLATION]"
+
+def correct_and_translate_with_chatgpt(text, max_in_flight=None, on_chunk_done=None, checkpoint=None, job=None, combined=False,
+                                       failures=None):
+    """Correct and translate Latin text, handing each corrected chunk straight to translation
+    
+    With combined=True each chunk is corrected and translated by a single request. failures,
+    if given, collects the stage of every part that fell back to placeholder or uncorrected text.
+    """
+    try:
+        logger.info(f"Starting {'combined' if combined else 'pipelined'} Latin correction and Dutch translation")
+        # Check if OPENAI_API_KEY is set
+        api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            logger.warning("OPENAI_API_KEY not set, using placeholder correction and translation")
+            if failures is not None:
+                failures.extend(['correction', 'translation'])
+            return text + " [CORRECTED]", "[DUTCH TRANSLATION PLACEHOLDER]"
+        
+        logger.info("OpenAI API key is set")
+        
+        # Each corrected chunk is translated as a whole, so chunks must fit both budgets
+        chunks = plan_chunks(text, combined_chunk_budget() if combined else pipelined_chunk_budget())
         
-        logger.info(f"Split text into {len(chunks)} chunks for translation")
+        logger.info(f"Split text into {len(chunks)} chunks for {'combined' if combined else 'pipelined'} processing")
         
-        translated_chunks = []
-        for i, chunk in enumerate(chunks):
-            logger.info(f"Translating chunk {i+1}/{len(chunks)}")
-            # Prepare the prompt
-            prompt = DUTCH_TRANSLATION_PROMPT.format(latin_text=chunk)
-            
-            # Make API call with retry logic
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    logger.info(f"Making OpenAI API call for Dutch translation (attempt {attempt+1}/{max_retries})")
-                    response = openai.ChatCompletion.create(
-                        model="gpt-4o",
-                        messages=[
-                            {"role": "system", "content": "You are an expert translator of early 16th century Latin to modern Dutch."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.4,
-                        max_tokens=4000,
-                        timeout=30
-                    )
-                    
-                    translated_text = response.choices[0].message.content.strip()
-                    logger.info(f"Successfully received translation for chunk {i+1}")
-                    translated_chunks.append(translated_text)
-                    break
-                except Exception as e:
-                    logger.error(f"Error in ChatGPT API call (attempt {attempt+1}/{max_retries}): {str(e)}")
-                    logger.error(traceback.format_exc())
-                    if attempt == max_retries - 1:
-                        logger.warning(f"All retries failed for chunk {i+1}, using placeholder")
-                        translated_chunks.append(f"[TRANSLATION ERROR FOR: {chunk[:100]}...]")
-                    else:
-                        time.sleep(2 ** attempt)  # Exponential backoff
+        # Chunk coroutines all run on the client loop, so the counter needs no lock
+        completed = [0]
         
-        logger.info("Dutch translation completed successfully")
-        return "\n".join(translated_chunks)
+        async def process_chunk(i, chunk, total_chunks):
+            if combined:
+                corrected_chunk, translated_chunk = await correct_and_translate_chunk(i, chunk, total_chunks, checkpoint, failures)
+            else:
+                corrected_chunk = await correct_latin_chunk(i, chunk, total_chunks, checkpoint, failures)
+                translated_chunk = await translate_dutch_chunk(i, corrected_chunk, total_chunks, checkpoint, failures)
+            if on_chunk_done:
+                completed[0] += 1
+                # Progress updates write to the task store; keep them off the loop
+                await asyncio.to_thread(on_chunk_done, i, completed[0], total_chunks)
+            return corrected_chunk, translated_chunk
+        
+        results = openai_client.run(dispatch_chunks(chunks, process_chunk, max_in_flight, job))
+        
+        logger.info("Pipelined correction and translation completed successfully")
+        return "\n".join(r[0] for r in results), "\n".join(r[1] for r in results)
     except Exception as e:
-        logger.error(f"Error in Dutch translation: {str(e)}")
+        logger.error(f"Error in pipelined correction and translation: {str(e)}")
         logger.error(traceback.format_exc())
-        return "[ERROR IN TRANSLATION]"
+        if failures is not None:
+            failures.extend(['correction', 'translation'])
+        return text + " [ERROR IN CORRECTION]", "[ERROR IN TRANSLATION]"
+
+W_P = qn('w:p')
+W_TBL = qn('w:tbl')
+W_TXBX = qn('w:txbxContent')
+# Run content that python-docx's Paragraph.text renders as text
+W_TEXT = {qn('w:t'): None, qn('w:tab'): '\t', qn('w:ptab'): '\t', qn('w:cr'): '\n', qn('w:noBreakHyphen'): '-'}
+W_BR = qn('w:br')
+W_BR_TYPE = qn('w:type')
+NOTE_PARTS = re.compile(r'^word/(header\d*|footer\d*|footnotes|endnotes)\.xml$')
+
+def _paragraph_text(p):
+    """Text of a w:p element, leaving out text boxes anchored in it"""
+    parts = []
+    stack = [p]
+    while stack:
+        elem = stack.pop()
+        tag = elem.tag
+        if tag in W_TEXT:
+            parts.append(W_TEXT[tag] if W_TEXT[tag] is not None else elem.text or '')
+        elif tag == W_BR:
+            if elem.get(W_BR_TYPE, 'textWrapping') == 'textWrapping':
+                parts.append('\n')
+        elif tag != W_TXBX:
+            stack.extend(reversed(elem))
+    return ''.join(parts)
+
+def iter_part_paragraphs(docx_zip, part_name, include_tables):
+    """Stream the paragraph texts of one XML part of a DOCX in document order
+    
+    Each top-level paragraph or table is dropped from the tree once it has been
+    read, so memory stays bounded by the largest single table.
+    """
+    paragraph_depth = 0
+    table_depth = 0
+    with docx_zip.open(part_name) as f:
+        for event, elem in etree.iterparse(f, events=('start', 'end'), resolve_entities=False, huge_tree=True):
+            tag = elem.tag
+            if event == 'start':
+                if tag == W_P:
+                    paragraph_depth += 1
+                elif tag == W_TBL:
+                    table_depth += 1
+                continue
+            
+            if tag == W_P:
+                paragraph_depth -= 1
+                # Paragraphs nested in another one are text box content
+                if paragraph_depth == 0 and (table_depth == 0 or include_tables):
+                    yield _paragraph_text(elem)
+            elif tag == W_TBL:
+                table_depth -= 1
+            else:
+                continue
+            
+            if paragraph_depth == 0 and table_depth == 0:
+                parent = elem.getparent()
+                elem.clear()
+                if parent is not None:
+                    while elem.getprevious() is not None:
+                        del parent[0]
+
+def extract_docx_text(file_path, include_tables=None, include_notes=None):
+    """Extract the text of a DOCX as one line per paragraph, without loading the document model"""
+    if include_tables is None:
+        include_tables = EXTRACT_TABLE_TEXT
+    if include_notes is None:
+        include_notes = EXTRACT_NOTE_TEXT
+    
+    with zipfile.ZipFile(file_path) as docx_zip:
+        paragraphs = list(iter_part_paragraphs(docx_zip, 'word/document.xml', include_tables))
+        if include_notes:
+            for part_name in sorted(name for name in docx_zip.namelist() if NOTE_PARTS.match(name)):
+                # Separator footnotes and empty header paragraphs carry no text
+                paragraphs.extend(text for text in iter_part_paragraphs(docx_zip, part_name, True) if text.strip())
+    
+    return ''.join(text + "\n" for text in paragraphs)
+
+def align_paragraphs(corrected_latin, dutch_translation):
+    """Pair corrected Latin and Dutch paragraphs line by line as [latin, dutch] rows"""
+    # Split text into paragraphs
+    latin_paragraphs = corrected_latin.split('\n')
+    dutch_paragraphs = dutch_translation.split('\n')
+    
+    # Ensure both lists have the same length
+    max_paragraphs = max(len(latin_paragraphs), len(dutch_paragraphs))
+    latin_paragraphs = latin_paragraphs + [''] * (max_paragraphs - len(latin_paragraphs))
+    dutch_paragraphs = dutch_paragraphs + [''] * (max_paragraphs - len(dutch_paragraphs))
+    
+    # Skip empty paragraphs
+    return [
+        [latin_para, dutch_para]
+        for latin_para, dutch_para in zip(latin_paragraphs, dutch_paragraphs)
+        if latin_para.strip() or dutch_para.strip()
+    ]
+
+def sidecar_path(docx_path):
+    """Path of the JSON file holding the aligned rows of a processed document"""
+    return os.path.splitext(docx_path)[0] + '.json'
+
+def save_aligned_rows(docx_path, title, rows):
+    """Write the aligned rows of a processed document next to it, for compilation"""
+    with open(sidecar_path(docx_path), 'w', encoding='utf-8') as f:
+        json.dump({'title': title, 'rows': rows}, f, ensure_ascii=False)
+
+def save_compiled_letters(docx_path, letters):
+    """Write the letters of a compiled document next to it, for previews"""
+    with open(sidecar_path(docx_path), 'w', encoding='utf-8') as f:
+        json.dump({'title': 'Compiled Latin Texts and Dutch Translations', 'letters': letters}, f, ensure_ascii=False)
+
+def load_aligned_rows(docx_path):
+    """Read the aligned rows of a processed document from its sidecar, or from the DOCX itself"""
+    path = sidecar_path(docx_path)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)['rows']
+    
+    # Documents processed before sidecars existed: read the table back
+    logger.info(f"No sidecar for {docx_path}, reading rows from the document")
+    doc = Document(docx_path)
+    rows = []
+    for table in doc.tables:
+        for row in table.rows[1:]:
+            cells = row.cells
+            rows.append([cells[0].text, cells[-1].text])
+    return rows
+
+def setup_a3_landscape(doc):
+    """Set A3 landscape orientation and margins on the document's first section"""
+    section = doc.sections[0]
+    section.orientation = WD_ORIENT.LANDSCAPE
+    section.page_width = Cm(42.0)  # A3 width
+    section.page_height = Cm(29.7)  # A3 height
+    
+    # Set margins
+    section.left_margin = Cm(2.0)
+    section.right_margin = Cm(2.0)
+    section.top_margin = Cm(2.0)
+    section.bottom_margin = Cm(2.0)
+    return section
+
+# Paragraph styles for the cells of the three-column table; defined once per
+# document so rows only reference them instead of formatting every run
+TABLE_HEADER_STYLE = 'Letter Table Header'
+TABLE_TEXT_STYLE = 'Letter Table Text'
+
+# Characters that are not allowed in XML 1.0 documents
+INVALID_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+def ensure_table_styles(doc):
+    """Add the header and text paragraph styles for the three-column table, if missing"""
+    existing = {style.name for style in doc.styles}
+    if TABLE_HEADER_STYLE not in existing:
+        header_style = doc.styles.add_style(TABLE_HEADER_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+        header_style.base_style = doc.styles['Normal']
+        header_style.font.bold = True
+        header_style.font.size = Pt(14)
+        header_style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        header_style.paragraph_format.space_after = Pt(12)
+    if TABLE_TEXT_STYLE not in existing:
+        text_style = doc.styles.add_style(TABLE_TEXT_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+        text_style.base_style = doc.styles['Normal']
+        text_style.font.size = Pt(12)
+        text_style.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.LEFT
+        text_style.paragraph_format.space_after = Pt(12)
+    return doc.styles[TABLE_HEADER_STYLE].style_id, doc.styles[TABLE_TEXT_STYLE].style_id
+
+def _cell_xml(text, width, style_id):
+    """WordprocessingML for one table cell holding a single styled paragraph"""
+    parts = [f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/></w:tcPr>'
+             f'<w:p><w:pPr><w:pStyle w:val="{style_id}"/></w:pPr>']
+    if text:
+        text = INVALID_XML_CHARS.sub('', text)
+        parts.append('<w:r>')
+        # Tabs and line breaks are separate elements, as python-docx writes them
+        for i, line in enumerate(text.split('\n')):
+            if i:
+                parts.append('<w:br/>')
+            for j, segment in enumerate(line.split('\t')):
+                if j:
+                    parts.append('<w:tab/>')
+                if segment:
+                    parts.append(f'<w:t xml:space="preserve">{xml_escape(segment)}</w:t>')
+        parts.append('</w:r>')
+    parts.append('</w:p></w:tc>')
+    return ''.join(parts)
+
+def add_three_column_table(doc, section, rows):
+    """Add a table with three columns (Latin, spacing, Dutch) holding the aligned rows
+    
+    The table XML is generated in one pass and parsed once, rather than built
+    cell by cell through python-docx.
+    """
+    header_style_id, text_style_id = ensure_table_styles(doc)
+    table_style_id = doc.styles['Table Grid'].style_id
+    
+    # Column widths: Latin 40%, spacing 20%, Dutch 40% of the available width (in twips)
+    available_width = section.page_width - section.left_margin - section.right_margin
+    widths = [
+        Emu(int(available_width * 0.4)).twips,
+        Emu(int(available_width * 0.2)).twips,
+        Emu(int(available_width * 0.4)).twips
+    ]
+    
+    parts = [
+        f'<w:tbl {nsdecls("w")}>'
+        f'<w:tblPr><w:tblStyle w:val="{table_style_id}"/><w:tblW w:type="auto" w:w="0"/>'
+        '<w:tblLayout w:type="fixed"/>'
+        '<w:tblLook w:firstColumn="1" w:firstRow="1" w:lastColumn="0" w:lastRow="0" '
+        'w:noHBand="0" w:noVBand="1" w:val="04A0"/></w:tblPr>'
+        '<w:tblGrid>',
+        ''.join(f'<w:gridCol w:w="{width}"/>' for width in widths),
+        '</w:tblGrid>'
+    ]
+    
+    # Header row
+    parts.append('<w:tr>')
+    parts.append(_cell_xml("Latin Text", widths[0], header_style_id))
+    parts.append(_cell_xml("", widths[1], header_style_id))
+    parts.append(_cell_xml("Dutch Translation", widths[2], header_style_id))
+    parts.append('</w:tr>')
+    
+    # Content rows; the middle column remains empty
+    empty_middle = _cell_xml("", widths[1], text_style_id)
+    for latin_para, dutch_para in rows:
+        parts.append('<w:tr>')
+        parts.append(_cell_xml(latin_para, widths[0], text_style_id))
+        parts.append(empty_middle)
+        parts.append(_cell_xml(dutch_para, widths[2], text_style_id))
+        parts.append('</w:tr>')
+    
+    parts.append('</w:tbl>')
+    
+    tbl = parse_xml(''.join(parts))
+    doc.element.body._insert_tbl(tbl)
+    return tbl
 
 def create_three_column_document(corrected_latin, dutch_translation, output_path):
     """Create a document with three columns (Latin, spacing, Dutch)"""
+    return write_three_column_document(align_paragraphs(corrected_latin, dutch_translation), output_path)
+
+@timed_stage('docx')
+def write_three_column_document(rows, output_path):
+    """Create a three-column document from aligned [latin, dutch] rows"""
     try:
         logger.info(f"Creating three-column document at {output_path}")
         doc = Document()
         
         # Set A3 landscape orientation
-        section = doc.sections[0]
-        section.orientation = WD_ORIENT.LANDSCAPE
-        section.page_width = Cm(42.0)  # A3 width
-        section.page_height = Cm(29.7)  # A3 height
-        
-        # Set margins
-        section.left_margin = Cm(2.0)
-        section.right_margin = Cm(2.0)
-        section.top_margin = Cm(2.0)
-        section.bottom_margin = Cm(2.0)
+        section = setup_a3_landscape(doc)
         
         # Add title
         title = doc.add_paragraph()
@@ -283,79 +2133,8 @@ def create_three_column_document(corrected_latin, dutch_translation, output_path
         # Add spacing
         doc.add_paragraph()
         
-        # Create table with three columns
-        table = doc.add_table(rows=1, cols=3)
-        table.style = 'Table Grid'
-        
-        # Set column widths
-        # First column (Latin): 40% of available width
-        # Middle column (spacing): 20% of available width
-        # Third column (Dutch): 40% of available width
-        table.autofit = False
-        table.allow_autofit = False
-        
-        # Calculate available width (A3 width minus margins)
-        available_width = section.page_width - section.left_margin - section.right_margin
-        
-        # Set column widths
-        table.columns[0].width = int(available_width * 0.4)
-        table.columns[1].width = int(available_width * 0.2)
-        table.columns[2].width = int(available_width * 0.4)
-        
-        # Add headers
-        header_cells = table.rows[0].cells
-        header_cells[0].text = "Latin Text"
-        header_cells[1].text = ""  # Empty middle column
-        header_cells[2].text = "Dutch Translation"
-        
-        # Style headers
-        for cell in header_cells:
-            for paragraph in cell.paragraphs:
-                paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                for run in paragraph.runs:
-                    run.font.bold = True
-                    run.font.size = Pt(14)
-        
-        # Split text into paragraphs
-        latin_paragraphs = corrected_latin.split('\n')
-        dutch_paragraphs = dutch_translation.split('\n')
-        
-        # Ensure both lists have the same length
-        max_paragraphs = max(len(latin_paragraphs), len(dutch_paragraphs))
-        latin_paragraphs = latin_paragraphs + [''] * (max_paragraphs - len(latin_paragraphs))
-        dutch_paragraphs = dutch_paragraphs + [''] * (max_paragraphs - len(dutch_paragraphs))
-        
-        # Add content rows
-        for latin_para, dutch_para in zip(latin_paragraphs, dutch_paragraphs):
-            # Skip empty paragraphs
-            if not latin_para.strip() and not dutch_para.strip():
-                continue
-                
-            row = table.add_row()
-            cells = row.cells
-            
-            # Add Latin text
-            cells[0].text = latin_para
-            
-            # Middle column remains empty
-            cells[1].text = ""
-            
-            # Add Dutch translation
-            cells[2].text = dutch_para
-            
-            # Style text
-            for cell in cells:
-                for paragraph in cell.paragraphs:
-                    paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                    for run in paragraph.runs:
-                        run.font.size = Pt(12)
-        
-        # Remove borders from table
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    paragraph.paragraph_format.space_after = Pt(12)
-                cell.border.top = cell.border.bottom = cell.border.left = cell.border.right = None
+        # Add the Latin / Dutch table
+        add_three_column_table(doc, section, rows)
         
         # Save document
         logger.info(f"Saving document to {output_path}")
@@ -380,32 +2159,21 @@ def create_three_column_document(corrected_latin, dutch_translation, output_path
         logger.error(traceback.format_exc())
         return False
 
-def compile_documents(processed_files, output_path):
-    """Compile all processed documents into a single document"""
+@timed_stage('compilation')
+def compile_documents(letters, output_path):
+    """Compile all processed letters into a single document
+    
+    letters is a list of {'name': ..., 'rows': [[latin, dutch], ...]} dicts, so the
+    compiled document is built from the aligned results without re-reading any DOCX.
+    """
     try:
         logger.info(f"Compiling documents into {output_path}")
-        logger.info(f"Number of files to compile: {len(processed_files)}")
-        for i, file_path in enumerate(processed_files):
-            logger.info(f"File {i+1}: {file_path}")
-            if not os.path.exists(file_path):
-                logger.error(f"File does not exist: {file_path}")
-            else:
-                file_size = os.path.getsize(file_path)
-                logger.info(f"File exists with size {file_size} bytes")
+        logger.info(f"Number of letters to compile: {len(letters)}")
         
         compiled_doc = Document()
         
         # Set A3 landscape orientation
-        section = compiled_doc.sections[0]
-        section.orientation = WD_ORIENT.LANDSCAPE
-        section.page_width = Cm(42.0)  # A3 width
-        section.page_height = Cm(29.7)  # A3 height
-        
-        # Set margins
-        section.left_margin = Cm(2.0)
-        section.right_margin = Cm(2.0)
-        section.top_margin = Cm(2.0)
-        section.bottom_margin = Cm(2.0)
+        section = setup_a3_landscape(compiled_doc)
         
         # Add title
         title = compiled_doc.add_paragraph()
@@ -431,14 +2199,12 @@ def compile_documents(processed_files, output_path):
         # Add table of contents
         toc = compiled_doc.add_paragraph()
         
-        # Process each file
-        for i, file_path in enumerate(processed_files):
-            # Get filename without extension
-            filename = os.path.basename(file_path)
-            name_without_ext = os.path.splitext(filename)[0]
+        # Process each letter
+        for i, letter in enumerate(letters):
+            name = letter['name']
             
             # Add to table of contents
-            toc_entry = toc.add_run(f"{i+1}. {name_without_ext}\n")
+            toc_entry = toc.add_run(f"{i+1}. {name}\n")
             toc_entry.font.size = Pt(12)
             
             # Add page break before each document (except the first one)
@@ -450,7 +2216,7 @@ def compile_documents(processed_files, output_path):
             
             # Add document title
             doc_title = compiled_doc.add_paragraph()
-            doc_title_run = doc_title.add_run(f"{i+1}. {name_without_ext}")
+            doc_title_run = doc_title.add_run(f"{i+1}. {name}")
             doc_title_run.font.size = Pt(16)
             doc_title_run.font.bold = True
             doc_title.alignment = WD_ALIGN_PARAGRAPH.CENTER
@@ -459,83 +2225,19 @@ def compile_documents(processed_files, output_path):
             compiled_doc.add_paragraph()
             
             try:
-                logger.info(f"Opening document {file_path}")
-                # Open the document
-                doc = Document(file_path)
-                
-                # Copy content from the document
-                # Skip the first few paragraphs (title, subtitle, etc.)
-                skip_paragraphs = 3
-                
-                # Find the table in the document
-                for table in doc.tables:
-                    # Create a new table in the compiled document
-                    new_table = compiled_doc.add_table(rows=1, cols=3)
-                    new_table.style = 'Table Grid'
-                    
-                    # Set column widths
-                    new_table.autofit = False
-                    new_table.allow_autofit = False
-                    
-                    # Calculate available width
-                    available_width = section.page_width - section.left_margin - section.right_margin
-                    
-                    # Set column widths
-                    new_table.columns[0].width = int(available_width * 0.4)
-                    new_table.columns[1].width = int(available_width * 0.2)
-                    new_table.columns[2].width = int(available_width * 0.4)
-                    
-                    # Copy headers
-                    header_cells = new_table.rows[0].cells
-                    source_header_cells = table.rows[0].cells
-                    
-                    for j in range(min(len(header_cells), len(source_header_cells))):
-                        header_cells[j].text = source_header_cells[j].text
-                    
-                    # Style headers
-                    for cell in header_cells:
-                        for paragraph in cell.paragraphs:
-                            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                            for run in paragraph.runs:
-                                run.font.bold = True
-                                run.font.size = Pt(14)
-                    
-                    # Copy rows
-                    for row_idx in range(1, len(table.rows)):
-                        source_row = table.rows[row_idx]
-                        new_row = new_table.add_row()
-                        
-                        # Copy cells
-                        for cell_idx in range(min(len(source_row.cells), len(new_row.cells))):
-                            source_cell = source_row.cells[cell_idx]
-                            new_cell = new_row.cells[cell_idx]
-                            
-                            # Copy text
-                            new_cell.text = source_cell.text
-                            
-                            # Style text
-                            for paragraph in new_cell.paragraphs:
-                                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
-                                for run in paragraph.runs:
-                                    run.font.size = Pt(12)
-                    
-                    # Remove borders from table
-                    for row in new_table.rows:
-                        for cell in row.cells:
-                            for paragraph in cell.paragraphs:
-                                paragraph.paragraph_format.space_after = Pt(12)
-                            cell.border.top = cell.border.bottom = cell.border.left = cell.border.right = None
+                add_three_column_table(compiled_doc, section, letter['rows'])
             except Exception as e:
-                logger.error(f"Error processing document {file_path}: {str(e)}")
+                logger.error(f"Error adding letter {name}: {str(e)}")
                 logger.error(traceback.format_exc())
                 error_para = compiled_doc.add_paragraph()
-                error_para.add_run(f"Error processing document: {str(e)}").font.color.rgb = (255, 0, 0)
+                error_para.add_run(f"Error processing document: {str(e)}").font.color.rgb = RGBColor(255, 0, 0)
         
         # Save compiled document
         logger.info(f"Saving compiled document to {output_path}")
         try:
             compiled_doc.save(output_path)
             logger.info(f"Compiled document saved successfully to {output_path}")
+            save_compiled_letters(output_path, letters)
             
             # Verify file exists after saving
             if os.path.exists(output_path):
@@ -554,107 +2256,280 @@ def compile_documents(processed_files, output_path):
         logger.error(traceback.format_exc())
         return False
 
+def load_preview_sections(docx_path):
+    """Titled groups of aligned rows shown in a document's preview: one per letter"""
+    path = sidecar_path(docx_path)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if 'letters' in data:
+            return [
+                {'title': f"{i+1}. {letter['name']}", 'rows': letter['rows']}
+                for i, letter in enumerate(data['letters'])
+            ]
+        return [{'title': data.get('title') or os.path.basename(docx_path), 'rows': data['rows']}]
+    return [{'title': os.path.basename(docx_path), 'rows': load_aligned_rows(docx_path)}]
+
+@functools.lru_cache(maxsize=1024)
+def preview_page_count(docx_path, size, mtime_ns):
+    """Number of preview pages of a document; size and mtime of its source are part of the key so edits miss the cache"""
+    rows = sum(len(section['rows']) for section in load_preview_sections(docx_path))
+    return max(1, math.ceil(rows / PREVIEW_PAGE_ROWS))
+
+def render_preview_page(filename, sections, page):
+    """HTML fragment for one page of a document preview; returns (html, page count)"""
+    # Number the rows across letters so pages hold the same number of rows
+    rows = [(index, row) for index, section in enumerate(sections) for row in section['rows']]
+    pages = max(1, math.ceil(len(rows) / PREVIEW_PAGE_ROWS))
+    page = min(max(1, page), pages)
+    
+    parts = [f'<div class="document-preview-pages" data-filename="{html.escape(filename)}" data-page="{page}" data-pages="{pages}">']
+    current_section = None
+    for index, (latin, dutch) in rows[(page - 1) * PREVIEW_PAGE_ROWS:page * PREVIEW_PAGE_ROWS]:
+        if index != current_section:
+            if current_section is not None:
+                parts.append('</tbody></table>')
+            current_section = index
+            parts.append(f'<h5 class="mt-3">{html.escape(sections[index]["title"])}</h5>')
+            parts.append('<table class="table table-bordered table-sm preview-table">'
+                         '<thead><tr><th>Latin Text</th><th>Dutch Translation</th></tr></thead><tbody>')
+        parts.append(f'<tr><td>{html.escape(latin)}</td><td>{html.escape(dutch)}</td></tr>')
+    if current_section is None:
+        parts.append('<p class="text-muted">This document has no text.</p>')
+    else:
+        parts.append('</tbody></table>')
+    
+    if pages > 1:
+        parts.append('<nav class="d-flex justify-content-between align-items-center mt-2">')
+        parts.append(f'<button class="btn btn-outline-secondary btn-sm preview-page-btn" data-page="{page - 1}"'
+                     f'{" disabled" if page == 1 else ""}>Previous</button>')
+        parts.append(f'<span>Page {page} of {pages}</span>')
+        parts.append(f'<button class="btn btn-outline-secondary btn-sm preview-page-btn" data-page="{page + 1}"'
+                     f'{" disabled" if page == pages else ""}>Next</button>')
+        parts.append('</nav>')
+    parts.append('</div>')
+    return ''.join(parts), pages
+
+def letter_from_output(output_path):
+    """Aligned letter (name and rows) of an already processed document"""
+    return {
+        'name': os.path.splitext(os.path.basename(output_path))[0],
+        'rows': load_aligned_rows(output_path)
+    }
+
+def process_document(task_id, file_path, index, total_files, max_in_flight, pipelined, checkpoint=None, original_filename=None,
+                     priority=TASK_PRIORITIES['normal'], combined=False):
+    """Process a single uploaded letter; returns (processed file entry, aligned letter or None)"""
+    job = (task_id, priority)
+    # Get original filename
+    original_filename = original_filename or os.path.basename(file_path)
+    try:
+        # Letters finished before an interruption are taken from the task checkpoint
+        if checkpoint:
+            record = checkpoint.get_file(index, file_path)
+            if record and os.path.exists(record['output_path']):
+                logger.info(f"Using checkpointed result for file {index+1}/{total_files}: {file_path}")
+                return record['entry'], letter_from_output(record['output_path'])
+        
+        # Letters with the same content as an earlier upload reuse that upload's document
+        content_hash = upload_content_hash(file_path)
+        if content_hash and REUSE_PROCESSED_RESULTS:
+            result = find_result(content_hash, pipeline_fingerprint(combined))
+            if result:
+                logger.info(f"Reusing earlier result for file {index+1}/{total_files}: {result['output_path']}")
+                entry = dict(result['entry'], original_name=original_filename)
+                return entry, letter_from_output(result['output_path'])
+        
+        logger.info(f"Processing file {index+1}/{total_files}: {file_path}")
+        
+        # Names of letters from an archive include their folder, which becomes part of the file name
+        name_without_ext = secure_filename(os.path.splitext(original_filename)[0]) or 'letter'
+        
+        # Extract text from document
+        logger.info(f"Extracting text from {file_path}")
+        with timed_stage('extraction'):
+            latin_text = extract_docx_text(file_path)
+        
+        logger.info(f"Extracted {len(latin_text)} characters of text")
+        
+        # Report the planned number of model calls for this letter up front
+        if combined:
+            planned_chunks = len(plan_chunks(latin_text, combined_chunk_budget()))
+        elif pipelined:
+            planned_chunks = len(plan_chunks(latin_text, pipelined_chunk_budget()))
+        else:
+            planned_chunks = len(plan_chunks(latin_text, correction_chunk_budget()))
+        update_task(task_id, increments={'planned_chunks': planned_chunks})
+        logger.info(f"Planned {planned_chunks} chunks for {original_filename}")
+        
+        # Stages of the parts that fell back; such a letter is not stored for reuse
+        failures = []
+        if pipelined or combined:
+            # Update task status
+            update_task(task_id, message=f'Correcting and translating {original_filename}...')
+            
+            def report_chunk(chunk_index, done, total_chunks):
+                update_task(task_id, message=f'Translated part {done} of {total_chunks} for {original_filename}...')
+            
+            # Correct and translate chunk by chunk, overlapping the two stages
+            corrected_latin, dutch_translation = correct_and_translate_with_chatgpt(
+                latin_text, max_in_flight, on_chunk_done=report_chunk, checkpoint=checkpoint, job=job, combined=combined,
+                failures=failures
+            )
+        else:
+            # Update task status
+            update_task(task_id, message=f'Correcting Latin text for {original_filename}...')
+            
+            # Correct Latin text
+            corrected_latin = correct_latin_with_chatgpt(latin_text, max_in_flight, checkpoint=checkpoint, job=job, failures=failures)
+            
+            # Update task status
+            update_task(task_id, message=f'Translating to Dutch for {original_filename}...')
+            
+            # Translate to Dutch
+            dutch_translation = translate_latin_to_dutch_with_chatgpt(
+                corrected_latin, max_in_flight, checkpoint=checkpoint, job=job, failures=failures
+            )
+        
+        # Update task status
+        update_task(task_id, message=f'Creating document for {original_filename}...')
+        
+        # Create output filename
+        # Task id and file index keep same-named letters finishing in the same second apart
+        output_filename = f"processed_{name_without_ext}_{int(time.time())}_{task_id[:8]}_{index+1}.docx"
+        output_path = os.path.join(PROCESSED_FOLDER, output_filename)
+        
+        logger.info(f"Creating document at {output_path}")
+        
+        # Align the paragraphs once; the rows feed both this document and the compiled one
+        rows = align_paragraphs(corrected_latin, dutch_translation)
+        
+        # Create document
+        success = write_three_column_document(rows, output_path)
+        
+        if success:
+            logger.info(f"Document created successfully at {output_path}")
+            letter = {'name': os.path.splitext(output_filename)[0], 'rows': rows}
+            entry = {
+                'original_name': original_filename,
+                'processed_name': output_filename,
+                'download_url': f'/download/{output_filename}'
+            }
+            try:
+                save_aligned_rows(output_path, letter['name'], rows)
+                if checkpoint:
+                    checkpoint.record_file(index, file_path, entry, output_path)
+                if content_hash and not failures and not any(marker in dutch_translation for marker in FALLBACK_MARKERS):
+                    record_result(content_hash, pipeline_fingerprint(combined), entry, output_path)
+            except Exception as e:
+                logger.error(f"Error saving aligned rows for {output_path}: {str(e)}")
+            return entry, letter
+        
+        logger.error(f"Failed to create document at {output_path}")
+        return {
+            'original_name': original_filename,
+            'error': "Failed to create document"
+        }, None
+    except Exception as e:
+        logger.error(f"Error processing file {file_path}: {str(e)}")
+        logger.error(traceback.format_exc())
+        return {
+            'original_name': original_filename,
+            'error': str(e)
+        }, None
+
+@timed_stage('task')
 def process_documents_thread(task_id, file_paths):
     """Process documents in a separate thread"""
+    checkpoint = None
+    heartbeat_stop = threading.Event()
     try:
         logger.info(f"Starting processing thread for task {task_id}")
         logger.info(f"Number of files to process: {len(file_paths)}")
         
         # Update task status
-        tasks[task_id]['status'] = 'processing'
-        tasks[task_id]['progress'] = 10
-        tasks[task_id]['message'] = 'Processing documents...'
+        task = update_task(task_id, status='processing', progress=10, message='Processing documents...', planned_chunks=0)
         
-        processed_files = []
-        processed_files_paths = []
+        # Keep the heartbeat fresh so other workers don't take the task over
+        def heartbeat():
+            while not heartbeat_stop.wait(TASK_HEARTBEAT_INTERVAL):
+                touch_task(task_id)
+        threading.Thread(target=heartbeat, daemon=True).start()
         
-        # Process each file
-        for i, file_path in enumerate(file_paths):
-            try:
-                logger.info(f"Processing file {i+1}/{len(file_paths)}: {file_path}")
-                
-                # Update task status
-                progress = 10 + int(80 * (i / len(file_paths)))
-                tasks[task_id]['progress'] = progress
-                tasks[task_id]['message'] = f'Processing file {i+1} of {len(file_paths)}...'
-                
-                # Get original filename
-                original_filename = os.path.basename(file_path)
-                name_without_ext = os.path.splitext(original_filename)[0]
-                
-                # Extract text from document
-                logger.info(f"Extracting text from {file_path}")
-                doc = Document(file_path)
-                latin_text = ""
-                
-                for para in doc.paragraphs:
-                    latin_text += para.text + "\n"
-                
-                logger.info(f"Extracted {len(latin_text)} characters of text")
-                
-                # Update task status
-                tasks[task_id]['message'] = f'Correcting Latin text for {original_filename}...'
-                
-                # Correct Latin text
-                corrected_latin = correct_latin_with_chatgpt(latin_text)
-                
-                # Update task status
-                tasks[task_id]['message'] = f'Translating to Dutch for {original_filename}...'
-                
-                # Translate to Dutch
-                dutch_translation = translate_latin_to_dutch_with_chatgpt(corrected_latin)
-                
-                # Update task status
-                tasks[task_id]['message'] = f'Creating document for {original_filename}...'
-                
-                # Create output filename
-                output_filename = f"processed_{name_without_ext}_{int(time.time())}.docx"
-                output_path = os.path.join(PROCESSED_FOLDER, output_filename)
-                
-                logger.info(f"Creating document at {output_path}")
-                
-                # Create document
-                success = create_three_column_document(corrected_latin, dutch_translation, output_path)
-                
-                if success:
-                    logger.info(f"Document created successfully at {output_path}")
-                    
-                    # Add to processed files
-                    processed_files.append({
-                        'original_name': original_filename,
-                        'processed_name': output_filename,
-                        'download_url': f'/download/{output_filename}'
-                    })
-                    
-                    # Add to processed files list for compilation
-                    processed_files_paths.append(output_path)
-                else:
-                    logger.error(f"Failed to create document at {output_path}")
-                    processed_files.append({
-                        'original_name': original_filename,
-                        'error': "Failed to create document"
-                    })
-            except Exception as e:
-                logger.error(f"Error processing file {file_path}: {str(e)}")
-                logger.error(traceback.format_exc())
-                # Add error to processed files
-                processed_files.append({
-                    'original_name': os.path.basename(file_path),
-                    'error': str(e)
-                })
+        # Resume from whatever an interrupted run already finished
+        checkpoint = TaskCheckpoint(task_id)
+        
+        # Results are kept in upload order regardless of which file finishes first
+        results = []
+        completed = [0]
+        completed_lock = threading.Lock()
+        
+        # Per-task limits on concurrent files and concurrent chunk requests
+        max_in_flight = task.get('max_concurrent_chunks') or MAX_CONCURRENT_CHUNKS
+        max_files = task.get('max_concurrent_files') or MAX_CONCURRENT_FILES
+        pipelined = task.get('pipelined', PIPELINED_PROCESSING)
+        combined = task.get('combined', COMBINED_PROCESSING)
+        priority = task.get('priority', TASK_PRIORITIES['normal'])
+        file_names = task.get('file_names') or [os.path.basename(file_path) for file_path in file_paths]
+        
+        def run_file(i, file_path, file_name):
+            result = process_document(
+                task_id, file_path, i, len(results), max_in_flight, pipelined, checkpoint, file_name, priority, combined
+            )
+            
+            with completed_lock:
+                results[i] = result
+                completed[0] += 1
+                done = completed[0]
+                # Publish per-file completion to status and event stream clients
+                finished = [result[0] for result in results if result is not None]
+                update_task(
+                    task_id,
+                    progress=10 + int(80 * (done / len(results))),
+                    message=f'Processed {done} of {len(results)} files...',
+                    processed_files=finished
+                )
+        
+        # Process files through a bounded worker pool; one failing file doesn't stop the others.
+        # Letters of a ZIP upload are picked up as soon as they have been read from the archive.
+        max_files = max(1, int(max_files))
+        logger.info(f"Processing {len(file_paths)} files with up to {max_files} in parallel")
+        with ThreadPoolExecutor(max_workers=max_files, thread_name_prefix='file') as executor:
+            futures = []
+            while True:
+                with completed_lock:
+                    for i in range(len(results), len(file_paths)):
+                        results.append(None)
+                        futures.append(executor.submit(run_file, i, file_paths[i], file_names[i]))
+                if not task.get('ingesting'):
+                    break
+                if time.time() - task.get('ingest_updated', 0) > TASK_STALE_SECONDS:
+                    logger.error(f"Archive ingest for task {task_id} stopped responding; processing the files read so far")
+                    break
+                time.sleep(SSE_POLL_INTERVAL)
+                task = get_task(task_id)
+                file_paths = task['file_paths']
+                file_names = task.get('file_names') or [os.path.basename(file_path) for file_path in file_paths]
+            for future in futures:
+                future.result()
+        
+        if not results:
+            raise ValueError('No DOCX files to process')
+        
+        processed_files = [result[0] for result in results]
+        processed_letters = [result[1] for result in results if result[1]]
         
         # Update task status
-        tasks[task_id]['progress'] = 90
-        tasks[task_id]['message'] = 'Compiling documents...'
+        update_task(task_id, progress=90, message='Compiling documents...')
         
         # Compile documents if there are multiple files
         compiled_doc = None
-        if len(processed_files_paths) > 1:
+        if len(processed_letters) > 1:
             logger.info("Compiling multiple documents")
-            compiled_filename = f"compiled_{int(time.time())}.docx"
+            compiled_filename = f"compiled_{int(time.time())}_{task_id[:8]}.docx"
             compiled_path = os.path.join(PROCESSED_FOLDER, compiled_filename)
             
-            if compile_documents(processed_files_paths, compiled_path):
+            if compile_documents(processed_letters, compiled_path):
                 logger.info(f"Compilation successful: {compiled_path}")
                 compiled_doc = {
                     'name': compiled_filename,
@@ -664,18 +2539,278 @@ def process_documents_thread(task_id, file_paths):
                 logger.error(f"Compilation failed: {compiled_path}")
         
         # Update task status
-        tasks[task_id]['status'] = 'completed'
-        tasks[task_id]['progress'] = 100
-        tasks[task_id]['message'] = 'Processing completed'
-        tasks[task_id]['processed_files'] = processed_files
-        tasks[task_id]['compiled_doc'] = compiled_doc
+        update_task(
+            task_id,
+            status='completed',
+            progress=100,
+            message='Processing completed',
+            processed_files=processed_files,
+            compiled_doc=compiled_doc
+        )
         
         logger.info(f"Task {task_id} completed successfully")
+        checkpoint.discard()
+        checkpoint = None
     except Exception as e:
         logger.error(f"Error in processing thread for task {task_id}: {str(e)}")
         logger.error(traceback.format_exc())
-        tasks[task_id]['status'] = 'error'
-        tasks[task_id]['message'] = f'Error: {str(e)}'
+        update_task(task_id, status='error', message=f'Error: {str(e)}')
+    finally:
+        heartbeat_stop.set()
+        if checkpoint:
+            checkpoint.close()
+
+def reuse_processed_results(task_id, file_paths, file_names):
+    """Completed task fields built from earlier results, or None unless every file has one"""
+    if not REUSE_PROCESSED_RESULTS:
+        return None
+    
+    # Uploads carry no processing settings, so results are looked up for the default mode
+    fingerprint = pipeline_fingerprint(COMBINED_PROCESSING)
+    processed_files = []
+    letters = []
+    for file_path, file_name in zip(file_paths, file_names):
+        content_hash = upload_content_hash(file_path)
+        result = find_result(content_hash, fingerprint) if content_hash else None
+        if result is None:
+            return None
+        processed_files.append(dict(result['entry'], original_name=file_name))
+        letters.append(letter_from_output(result['output_path']))
+    
+    # A batch still gets its own compiled document; compiling needs no model calls
+    compiled_doc = None
+    if len(letters) > 1:
+        # Named after the task too, since a repeated batch is compiled within the same second
+        compiled_filename = f"compiled_{int(time.time())}_{task_id[:8]}.docx"
+        if compile_documents(letters, os.path.join(PROCESSED_FOLDER, compiled_filename)):
+            compiled_doc = {
+                'name': compiled_filename,
+                'download_url': f'/download/{compiled_filename}'
+            }
+        else:
+            return None
+    
+    return {
+        'status': 'completed',
+        'progress': 100,
+        'message': 'Processing completed (reused earlier results)',
+        'processed_files': processed_files,
+        'compiled_doc': compiled_doc
+    }
+
+def ingest_zip_archive(task_id, archive_path):
+    """Store the letters of an uploaded ZIP archive one by one, adding each to the task as it is read"""
+    file_paths = []
+    file_names = []
+    skipped = []
+    total_bytes = 0
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                name = info.filename
+                filename = secure_filename(os.path.basename(name))
+                # Letters keep their folder inside the archive, so same-named letters can be told apart
+                display_name = '/'.join(part for part in map(secure_filename, name.split('/')) if part)
+                # Folders, macOS resource forks and Word lock files aren't letters
+                if info.is_dir() or name.startswith('__MACOSX/') or os.path.basename(name).startswith(('.', '~$')):
+                    continue
+                if not allowed_file(filename):
+                    skipped.append({'name': name, 'reason': 'Not a DOCX file'})
+                    continue
+                if len(file_paths) >= ZIP_MAX_ENTRIES:
+                    skipped.append({'name': name, 'reason': f'Archive has more than {ZIP_MAX_ENTRIES} letters'})
+                    continue
+                if info.file_size > ZIP_MAX_ENTRY_BYTES:
+                    skipped.append({'name': name, 'reason': 'File too large'})
+                    continue
+                if total_bytes + info.file_size > ZIP_MAX_TOTAL_BYTES:
+                    skipped.append({'name': name, 'reason': 'Archive total size limit reached'})
+                    continue
+                
+                try:
+                    # The declared size can't be trusted, so the limit is enforced while reading too
+                    with archive.open(info) as entry:
+                        file_path, content_hash, file_size = save_upload(entry, max_bytes=ZIP_MAX_ENTRY_BYTES)
+                except ValueError:
+                    skipped.append({'name': name, 'reason': 'File too large'})
+                    continue
+                except Exception as e:
+                    logger.error(f"Error reading {name} from archive for task {task_id}: {str(e)}")
+                    skipped.append({'name': name, 'reason': 'Could not be read from the archive'})
+                    continue
+                
+                if not is_valid_docx(file_path):
+                    os.remove(file_path)
+                    skipped.append({'name': name, 'reason': 'Not a valid DOCX file'})
+                    continue
+                
+                total_bytes += file_size
+                UPLOAD_BYTES.observe(file_size)
+                file_paths.append(file_path)
+                file_names.append(display_name)
+                update_task(task_id, file_paths=file_paths, file_names=file_names, ingest_updated=time.time())
+                logger.info(f"Read {name} from archive for task {task_id} ({file_size} bytes)")
+    except Exception as e:
+        logger.error(f"Error reading archive for task {task_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        skipped.append({'name': os.path.basename(archive_path), 'reason': f'Archive could not be read: {str(e)}'})
+    finally:
+        update_task(task_id, file_paths=file_paths, file_names=file_names, skipped_files=skipped, ingesting=False)
+        try:
+            os.remove(archive_path)
+        except OSError:
+            pass
+        logger.info(f"Finished reading archive for task {task_id}: {len(file_paths)} letters, {len(skipped)} skipped")
+
+def _dos_datetime(timestamp):
+    """ZIP (MS-DOS) date and time fields for a Unix timestamp"""
+    t = time.localtime(max(timestamp, 315532800))  # DOS dates start in 1980
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+def zip_stored_length(entries):
+    """Exact size of the archive stream_zip_stored produces for (archive name, path, size) entries"""
+    return sum(30 + 46 + 2 * len(name.encode('utf-8')) + size for name, _, size in entries) + 22
+
+def stream_zip_stored(entries, block_size=1024 * 1024):
+    """Yield an uncompressed ZIP archive of (archive name, path, size) entries piece by piece
+    
+    DOCX files are already compressed, so entries are stored as they are and the
+    archive size is known up front. Each file is read twice, once for its CRC and
+    once for its data, so neither the archive nor a whole file is held in memory.
+    """
+    central_directory = []
+    offset = 0
+    for name, path, size in entries:
+        encoded_name = name.encode('utf-8')
+        crc = 0
+        with open(path, 'rb') as f:
+            remaining = size
+            while remaining:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    raise IOError(f"{path} is shorter than {size} bytes")
+                crc = zlib.crc32(block, crc)
+                remaining -= len(block)
+        dos_time, dos_date = _dos_datetime(os.path.getmtime(path))
+        
+        # Version 2.0, UTF-8 names (flag bit 11), method 0 (stored)
+        header = struct.pack(
+            '<IHHHHHIIIHH', 0x04034b50, 20, 0x0800, 0, dos_time, dos_date, crc, size, size, len(encoded_name), 0
+        )
+        yield header + encoded_name
+        with open(path, 'rb') as f:
+            remaining = size
+            while remaining:
+                block = f.read(min(block_size, remaining))
+                if not block:
+                    raise IOError(f"{path} is shorter than {size} bytes")
+                remaining -= len(block)
+                yield block
+        
+        central_directory.append(struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014b50, 20, 20, 0x0800, 0, dos_time, dos_date, crc, size, size,
+            len(encoded_name), 0, 0, 0, 0, 0, offset
+        ) + encoded_name)
+        offset += len(header) + len(encoded_name) + size
+    
+    directory = b''.join(central_directory)
+    yield directory + struct.pack(
+        '<IHHHHIIH', 0x06054b50, 0, 0, len(entries), len(entries), len(directory), offset, 0
+    )
+
+class TaskQueue:
+    """Admission queue for processing tasks: at most max_active run at once, the rest wait by priority
+    
+    Waiting tasks are ordered by priority, then by arrival. Their heartbeat is
+    kept fresh so other workers don't take them over as interrupted.
+    """
+    
+    def __init__(self, max_active):
+        self.max_active = max_active
+        self.queue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.lock = threading.Lock()
+        self.queued = set()
+        self.active = 0
+        self.runners = []
+    
+    def submit(self, task_id, file_paths, priority):
+        with self.lock:
+            self.queued.add(task_id)
+            # Runner threads are started on first use, after gunicorn has forked the worker
+            if not self.runners:
+                self.runners = [
+                    threading.Thread(target=self._run, name=f'task-runner-{i}', daemon=True)
+                    for i in range(self.max_active)
+                ]
+                self.runners.append(threading.Thread(target=self._heartbeat, name='task-queue-heartbeat', daemon=True))
+                for runner in self.runners:
+                    runner.start()
+        self.queue.put((-priority, next(self.sequence), task_id, file_paths))
+    
+    def _run(self):
+        while True:
+            _, _, task_id, file_paths = self.queue.get()
+            with self.lock:
+                self.queued.discard(task_id)
+                self.active += 1
+            try:
+                process_documents_thread(task_id, file_paths)
+            except Exception as e:
+                logger.error(f"Error running task {task_id}: {str(e)}")
+                logger.error(traceback.format_exc())
+            finally:
+                with self.lock:
+                    self.active -= 1
+    
+    def _heartbeat(self):
+        while True:
+            time.sleep(TASK_HEARTBEAT_INTERVAL)
+            with self.lock:
+                waiting = list(self.queued)
+            for task_id in waiting:
+                try:
+                    touch_task(task_id)
+                except Exception as e:
+                    logger.error(f"Error refreshing queued task {task_id}: {str(e)}")
+    
+    def stats(self):
+        with self.lock:
+            return {'max_active': self.max_active, 'active': self.active, 'queued': len(self.queued)}
+
+task_queue = TaskQueue(MAX_ACTIVE_TASKS)
+
+def start_processing_thread(task_id, file_paths, priority=TASK_PRIORITIES['normal']):
+    """Queue a claimed task for processing by one of the task runner threads"""
+    task_queue.submit(task_id, file_paths, priority)
+    stats = task_queue.stats()
+    if stats['active'] >= stats['max_active']:
+        # Skipped if a runner has already picked the task up
+        update_task(
+            task_id, only_if_status=('queued',),
+            message=f"Waiting for a free slot ({stats['queued']} task(s) queued)..."
+        )
+
+def resume_interrupted_tasks():
+    """Take over processing tasks whose worker died and restart them from their checkpoints"""
+    for task_id in list_stale_task_ids(TASK_STALE_SECONDS):
+        task = claim_stale_task(task_id, TASK_STALE_SECONDS)
+        if task:
+            logger.info(f"Resuming interrupted task {task_id}")
+            start_processing_thread(task_id, task['file_paths'], task.get('priority', TASK_PRIORITIES['normal']))
+
+def resume_watcher():
+    """Periodically look for interrupted tasks (the first check runs at startup)"""
+    while True:
+        try:
+            resume_interrupted_tasks()
+        except Exception as e:
+            logger.error(f"Error resuming interrupted tasks: {str(e)}")
+            logger.error(traceback.format_exc())
+        time.sleep(TASK_HEARTBEAT_INTERVAL)
+
+if RESUME_INTERRUPTED_TASKS:
+    threading.Thread(target=resume_watcher, daemon=True).start()
 
 # Routes
 @app.route('/')
@@ -702,12 +2837,8 @@ def upload_file():
     # Create task
     task_id = str(uuid.uuid4())
     logger.info(f"Created task {task_id}")
-    tasks[task_id] = {
-        'status': 'uploaded',
-        'progress': 0,
-        'message': 'Files uploaded',
-        'file_paths': []
-    }
+    file_paths = []
+    file_names = []
     
     # Process each file
     for file in files:
@@ -717,97 +2848,411 @@ def upload_file():
             filename = secure_filename(file.filename)
             logger.info(f"Processing file: {filename}")
             
-            # Add timestamp to filename to avoid collisions
-            timestamp = int(time.time())
-            filename_with_timestamp = f"{timestamp}_{filename}"
-            
-            # Save file
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename_with_timestamp)
-            logger.info(f"Saving file to {file_path}")
+            # Save file under its content hash, so a letter uploaded again is stored once
             try:
-                file.save(file_path)
-                logger.info(f"File saved successfully to {file_path}")
-                
-                # Verify file exists after saving
-                if os.path.exists(file_path):
-                    file_size = os.path.getsize(file_path)
-                    logger.info(f"Verified file exists at {file_path} with size {file_size} bytes")
-                else:
-                    logger.error(f"File does not exist after saving: {file_path}")
+                file_path, content_hash, file_size = save_upload(file.stream)
+                logger.info(f"File saved to {file_path} ({file_size} bytes)")
+                UPLOAD_BYTES.observe(file_size)
                 
                 # Add to task
-                tasks[task_id]['file_paths'].append(file_path)
+                file_paths.append(file_path)
+                file_names.append(filename)
             except Exception as e:
-                logger.error(f"Error saving file to {file_path}: {str(e)}")
+                logger.error(f"Error saving file {filename}: {str(e)}")
                 logger.error(traceback.format_exc())
         else:
             logger.warning(f"Invalid file: {file.filename}")
     
     # Check if any files were saved
-    if not tasks[task_id]['file_paths']:
+    if not file_paths:
         logger.warning("No valid files uploaded")
-        del tasks[task_id]
         return jsonify({'error': 'No valid files uploaded'}), 400
     
+    task = {
+        'status': 'uploaded',
+        'progress': 0,
+        'message': 'Files uploaded',
+        'file_paths': file_paths,
+        'file_names': file_names
+    }
+    
+    # When every letter was processed before, the task is complete without running the pipeline
+    reused = reuse_processed_results(task_id, file_paths, file_names)
+    if reused:
+        task.update(reused)
+        logger.info(f"All files of task {task_id} were processed before; reusing their results")
+    
+    create_task(task_id, task)
+    
     logger.info(f"Upload successful for task {task_id}")
-    return jsonify({'task_id': task_id}), 200
+    return jsonify({'task_id': task_id, 'status': task['status']}), 200
+
+@app.route('/upload-zip', methods=['POST'])
+def upload_zip():
+    """Accept a ZIP archive of letters; they are added to the task while it is being read"""
+    logger.info("Received ZIP upload request")
+    # An archive may be much larger than a single letter
+    request.max_content_length = ZIP_MAX_ARCHIVE_BYTES
+    
+    # The archive is either a multipart 'archive' field or the raw request body
+    archive = request.files.get('archive')
+    if archive is not None and archive.filename == '':
+        archive = None
+    if archive is None and request.mimetype not in ('application/zip', 'application/x-zip-compressed'):
+        logger.warning("No archive uploaded")
+        return jsonify({'error': 'No archive uploaded'}), 400
+    source = archive.stream if archive is not None else request.stream
+    
+    # Spool the archive to disk; its entries are read from there one at a time
+    fd, archive_path = tempfile.mkstemp(dir=UPLOAD_FOLDER, suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            shutil.copyfileobj(source, f, 1024 * 1024)
+    except Exception as e:
+        os.remove(archive_path)
+        logger.error(f"Error saving archive: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise
+    
+    if not zipfile.is_zipfile(archive_path):
+        os.remove(archive_path)
+        logger.warning("Uploaded archive is not a ZIP file")
+        return jsonify({'error': 'Not a valid ZIP archive'}), 400
+    
+    task_id = str(uuid.uuid4())
+    logger.info(f"Created task {task_id} for archive of {os.path.getsize(archive_path)} bytes")
+    create_task(task_id, {
+        'status': 'uploaded',
+        'progress': 0,
+        'message': 'Reading letters from archive',
+        'file_paths': [],
+        'file_names': [],
+        'skipped_files': [],
+        'ingesting': True,
+        'ingest_updated': time.time()
+    })
+    threading.Thread(target=ingest_zip_archive, args=(task_id, archive_path), daemon=True).start()
+    
+    return jsonify({'task_id': task_id, 'status': 'uploaded'}), 200
 
 @app.route('/process/<task_id>', methods=['POST'])
 def process_files(task_id):
     logger.info(f"Received process request for task {task_id}")
-    # Check if task exists
-    if task_id not in tasks:
-        logger.warning(f"Task not found: {task_id}")
-        return jsonify({'error': 'Task not found'}), 404
+    # Optional per-task processing settings
+    options = request.get_json(silent=True) or {}
+    settings = {}
+    if options.get('max_concurrent_chunks'):
+        try:
+            settings['max_concurrent_chunks'] = max(1, int(options['max_concurrent_chunks']))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid max_concurrent_chunks for task {task_id}: {options['max_concurrent_chunks']}")
+            return jsonify({'error': 'max_concurrent_chunks must be an integer'}), 400
+    if options.get('max_concurrent_files'):
+        try:
+            settings['max_concurrent_files'] = max(1, int(options['max_concurrent_files']))
+        except (TypeError, ValueError):
+            logger.warning(f"Invalid max_concurrent_files for task {task_id}: {options['max_concurrent_files']}")
+            return jsonify({'error': 'max_concurrent_files must be an integer'}), 400
+    if 'pipelined' in options:
+        # bool() would read the string "false" as true, so only JSON booleans are accepted
+        if not isinstance(options['pipelined'], bool):
+            logger.warning(f"Invalid pipelined for task {task_id}: {options['pipelined']}")
+            return jsonify({'error': 'pipelined must be true or false'}), 400
+        settings['pipelined'] = options['pipelined']
+    if 'combined' in options:
+        if not isinstance(options['combined'], bool):
+            logger.warning(f"Invalid combined for task {task_id}: {options['combined']}")
+            return jsonify({'error': 'combined must be true or false'}), 400
+        settings['combined'] = options['combined']
+    if 'priority' in options:
+        priority = options['priority']
+        if isinstance(priority, str) and priority in TASK_PRIORITIES:
+            settings['priority'] = TASK_PRIORITIES[priority]
+        # bool is a subclass of int, and true would otherwise pass for priority 1
+        elif isinstance(priority, int) and not isinstance(priority, bool) and priority in TASK_PRIORITIES.values():
+            settings['priority'] = priority
+        else:
+            logger.warning(f"Invalid priority for task {task_id}: {priority}")
+            return jsonify({'error': f"priority must be one of {', '.join(TASK_PRIORITIES)}"}), 400
     
-    # Check if task is already processing
-    if tasks[task_id]['status'] == 'processing':
+    # Claim the task atomically so two workers can't both start it; a task
+    # whose processing thread died is taken over and resumes from its checkpoint
+    task = update_task(
+        task_id,
+        only_if_status=('uploaded', 'completed', 'error'),
+        status='queued',
+        message='Starting processing...',
+        **settings
+    ) or claim_stale_task(task_id, TASK_STALE_SECONDS)
+    if task is None:
+        # Check if task exists
+        if get_task(task_id) is None:
+            logger.warning(f"Task not found: {task_id}")
+            return jsonify({'error': 'Task not found'}), 404
+        
         logger.warning(f"Task {task_id} is already processing")
         return jsonify({'error': 'Task is already processing'}), 400
     
     logger.info(f"Starting processing for task {task_id}")
     
     # Start processing thread
-    thread = threading.Thread(
-        target=process_documents_thread,
-        args=(task_id, tasks[task_id]['file_paths'])
-    )
-    thread.daemon = True
-    thread.start()
+    start_processing_thread(task_id, task['file_paths'], task.get('priority', TASK_PRIORITIES['normal']))
     
     logger.info(f"Processing thread started for task {task_id}")
     return jsonify({'status': 'processing_started'}), 200
 
 @app.route('/status/<task_id>')
 def get_status(task_id):
-    logger.info(f"Received status request for task {task_id}")
+    # The page polls this every few seconds, so only a sample of polls is logged
+    logger.info(f"Received status request for task {task_id}", extra={'sample': 'status-request'})
     # Check if task exists
-    if task_id not in tasks:
+    task = get_task(task_id)
+    if task is None:
         logger.warning(f"Task not found: {task_id}")
         return jsonify({'error': 'Task not found'}), 404
     
     # Return task status
-    logger.info(f"Returning status for task {task_id}: {tasks[task_id]['status']}")
-    return jsonify(tasks[task_id]), 200
+    logger.info(f"Returning status for task {task_id}: {task['status']}", extra={'sample': 'status-response'})
+    return jsonify(task), 200
+
+class EventStreamSlots:
+    """Counts the event streams open in this worker and refuses new ones past the limit"""
+    
+    def __init__(self, limit):
+        self.limit = limit
+        self.lock = threading.Lock()
+        self.open = 0
+        self.rejected = 0
+    
+    def acquire(self):
+        with self.lock:
+            if self.open >= self.limit:
+                self.rejected += 1
+                return False
+            self.open += 1
+            return True
+    
+    def release(self):
+        with self.lock:
+            self.open -= 1
+    
+    def stats(self):
+        with self.lock:
+            return {'open': self.open, 'limit': self.limit, 'rejected': self.rejected}
+
+event_stream_slots = EventStreamSlots(SSE_MAX_STREAMS)
+
+metrics.register(Gauge(
+    'latin_event_streams_open', 'Progress event streams open in this worker',
+    lambda: event_stream_slots.stats()['open']
+))
+metrics.register(Gauge(
+    'latin_event_streams_rejected_total', 'Progress event streams refused because the worker was at its limit',
+    lambda: event_stream_slots.stats()['rejected'], kind='counter'
+))
+
+@app.route('/events/<task_id>')
+def task_events(task_id):
+    """Stream task progress as Server-Sent Events, sending only when the task changes"""
+    logger.info(f"Received event stream request for task {task_id}")
+    # Check if task exists
+    if get_task(task_id) is None:
+        logger.warning(f"Task not found: {task_id}")
+        return jsonify({'error': 'Task not found'}), 404
+    
+    # Streams that would use up the worker's threads are refused; the page polls /status instead
+    if not event_stream_slots.acquire():
+        logger.warning(f"Refusing event stream for task {task_id}: {SSE_MAX_STREAMS} streams already open")
+        return jsonify({'error': 'Too many event streams, poll /status instead'}), 503, {'Retry-After': '30'}
+    
+    def stream():
+        started = time.time()
+        last_sent = started
+        last_version = None
+        last_payload = None
+        
+        # Ask the browser to reconnect quickly when the stream is recycled
+        yield f"retry: {int(SSE_POLL_INTERVAL * 2000)}\n\n"
+        
+        while True:
+            version = get_task_version(task_id)
+            if version is None:
+                yield 'event: error\ndata: {"error": "Task not found"}\n\n'
+                return
+            
+            if version != last_version:
+                last_version = version
+                task = get_task(task_id)
+                # Server-side file paths are of no use to the browser
+                task.pop('file_paths', None)
+                payload = json.dumps(task)
+                if payload != last_payload:
+                    last_payload = payload
+                    last_sent = time.time()
+                    yield f"id: {version}\nevent: status\ndata: {payload}\n\n"
+                if task.get('status') in ('completed', 'error'):
+                    return
+            elif time.time() - last_sent >= SSE_HEARTBEAT_INTERVAL:
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            
+            if time.time() - started >= SSE_MAX_STREAM_SECONDS:
+                return
+            time.sleep(SSE_POLL_INTERVAL)
+    
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Called when the server closes the response, even if the stream never started
+    response.call_on_close(event_stream_slots.release)
+    return response
+
+@functools.lru_cache(maxsize=1024)
+def file_etag(file_path, size, mtime_ns):
+    """Strong ETag from a file's content; size and mtime are part of the key so edits miss the cache"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:32]
+
+def attachment_filename_options(filename):
+    """Content-Disposition filename options for a download name, as send_file sets them"""
+    try:
+        filename.encode('ascii')
+    except UnicodeEncodeError:
+        # Plain ASCII fallback plus the RFC 5987 UTF-8 form for browsers that understand it
+        simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+        return {'filename': simple, 'filename*': "UTF-8''" + quote(filename, safe="!#$&+-.^_`|~")}
+    return {'filename': filename}
+
+def send_processed_file(filename, as_attachment):
+    """Send a processed file with a content ETag, conditional requests and byte ranges
+    
+    With FILE_OFFLOAD_MODE set, only the headers come from here and the front
+    proxy sends the bytes (and handles Range itself). Returns None if the file
+    doesn't exist.
+    """
+    file_path = safe_join(app.config['PROCESSED_FOLDER'], filename)
+    try:
+        stat = os.stat(file_path) if file_path else None
+    except FileNotFoundError:
+        stat = None
+    if stat is None:
+        return None
+    
+    etag = file_etag(file_path, stat.st_size, stat.st_mtime_ns)
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    
+    if FILE_OFFLOAD_MODE not in ('x-sendfile', 'x-accel-redirect'):
+        # send_file answers If-None-Match/If-Modified-Since with 304 and Range/If-Range with 206
+        return send_file(
+            file_path, as_attachment=as_attachment, download_name=filename,
+            etag=etag, last_modified=last_modified, conditional=True
+        )
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304)
+    else:
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        if FILE_OFFLOAD_MODE == 'x-sendfile':
+            response.headers['X-Sendfile'] = os.path.abspath(file_path)
+        else:
+            response.headers['X-Accel-Redirect'] = X_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + quote(filename)
+        if as_attachment:
+            # Headers.set quotes and escapes the options
+            response.headers.set('Content-Disposition', 'attachment', **attachment_filename_options(filename))
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/download/<filename>')
 def download_file(filename):
     logger.info(f"Received download request for file: {filename}")
-    
-    # Check if file exists
-    file_path = os.path.join(app.config['PROCESSED_FOLDER'], filename)
-    if not os.path.exists(file_path):
-        logger.error(f"File not found: {file_path}")
-        return jsonify({'error': 'File not found'}), 404
-    
-    logger.info(f"Sending file: {file_path}")
     try:
-        return send_from_directory(app.config['PROCESSED_FOLDER'], filename, as_attachment=True)
+        response = send_processed_file(filename, as_attachment=True)
+        if response is None:
+            logger.error(f"File not found: {filename}")
+            return jsonify({'error': 'File not found'}), 404
+        logger.info(f"Sending file {filename} ({response.status_code})")
+        return response
     except Exception as e:
         logger.error(f"Error sending file {filename}: {str(e)}")
         logger.error(traceback.format_exc())
         return jsonify({'error': f'Error sending file: {str(e)}'}), 500
 
+@app.route('/download-all/<task_id>')
+def download_all(task_id):
+    """Stream a ZIP of every processed document of a task plus the compiled document"""
+    logger.info(f"Received download-all request for task {task_id}")
+    task = get_task(task_id)
+    if task is None:
+        logger.warning(f"Task not found: {task_id}")
+        return jsonify({'error': 'Task not found'}), 404
+    
+    names = [entry['processed_name'] for entry in task.get('processed_files') or [] if entry.get('processed_name')]
+    if task.get('compiled_doc'):
+        names.append(task['compiled_doc']['name'])
+    
+    entries = []
+    for name in dict.fromkeys(names):
+        file_path = os.path.join(app.config['PROCESSED_FOLDER'], secure_filename(name))
+        if os.path.exists(file_path):
+            entries.append((name, file_path, os.path.getsize(file_path)))
+        else:
+            logger.warning(f"File not found for download-all: {file_path}")
+    if not entries:
+        return jsonify({'error': 'No processed files to download'}), 404
+    
+    # Without ZIP64 an archive can't exceed 4 GB; a task's documents never come close
+    length = zip_stored_length(entries)
+    if length > 0xFFFFFFFF or len(entries) > 0xFFFF:
+        return jsonify({'error': 'Too many files to download as one archive'}), 413
+    
+    logger.info(f"Streaming {len(entries)} files ({length} bytes) for task {task_id}")
+    return Response(
+        stream_zip_stored(entries),
+        mimetype='application/zip',
+        headers={
+            'Content-Length': str(length),
+            'Content-Disposition': f'attachment; filename="letters_{task_id[:8]}.zip"'
+        }
+    )
+
+def send_preview_page(filename, file_path, page):
+    """Serve one preview page from the disk cache, rendering it on first request
+    
+    The ETag covers the document's size and modification time, so a browser
+    revalidating an unchanged preview gets a 304 without the cache being read.
+    """
+    source_path = sidecar_path(file_path) if os.path.exists(sidecar_path(file_path)) else file_path
+    stat = os.stat(source_path)
+    # Out-of-range pages render as the nearest real page, so they share its ETag and cache entry
+    page = min(max(1, page), preview_page_count(file_path, stat.st_size, stat.st_mtime_ns))
+    etag = hashlib.sha256(
+        f"{filename}:{page}:{stat.st_size}:{stat.st_mtime_ns}:{PREVIEW_PAGE_ROWS}".encode('utf-8')
+    ).hexdigest()[:32]
+    last_modified = datetime.fromtimestamp(int(stat.st_mtime), tz=timezone.utc)
+    headers = {'Cache-Control': 'no-cache'}
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        response = Response(status=304, headers=headers)
+        response.set_etag(etag)
+        return response
+    
+    body = preview_cache.get(etag)
+    if body is None:
+        logger.info(f"Rendering preview page {page} of {filename}")
+        body, _ = render_preview_page(filename, load_preview_sections(file_path), page)
+        preview_cache.put(etag, body)
+    
+    response = Response(body, mimetype='text/html', headers=headers)
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
+
 @app.route('/preview/<filename>')
 def preview_file(filename):
     logger.info(f"Received preview request for file: {filename}")
@@ -818,21 +3263,20 @@ def preview_file(filename):
         logger.error(f"File not found: {file_path}")
         abort(404)
     
-    # For DOCX files, we can't preview directly in the browser
-    # Return a placeholder or convert to PDF in a production environment
+    # DOCX files are previewed as HTML pages of their aligned rows
     if filename.endswith('.docx'):
-        logger.info(f"Sending DOCX file for preview: {filename}")
+        page = request.args.get('page', 1, type=int)
         try:
-            return send_from_directory(app.config['PROCESSED_FOLDER'], filename, as_attachment=False)
+            return send_preview_page(filename, file_path, page)
         except Exception as e:
-            logger.error(f"Error sending file for preview {filename}: {str(e)}")
+            logger.error(f"Error rendering preview for {filename}: {str(e)}")
             logger.error(traceback.format_exc())
-            return jsonify({'error': f'Error sending file for preview: {str(e)}'}), 500
+            return jsonify({'error': f'Error rendering preview: {str(e)}'}), 500
     
     # For other files, return them directly
     logger.info(f"Sending file for preview: {filename}")
     try:
-        return send_from_directory(app.config['PROCESSED_FOLDER'], filename)
+        return send_processed_file(filename, as_attachment=False)
     except Exception as e:
         logger.error(f"Error sending file for preview {filename}: {str(e)}")
         logger.error(traceback.format_exc())
@@ -854,14 +3298,27 @@ def internal_server_error(error):
     logger.error(f"500 error: {str(error)}")
     return jsonify({'error': 'Internal server error'}), 500
 
+def tail_lines(path, count, block_size=8192):
+    """Return the last `count` lines of a file, reading backwards from the end in blocks"""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b''
+        # One newline more than lines wanted, since the file normally ends with one
+        while position > 0 and data.count(b'\n') <= count:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            data = f.read(read_size) + data
+    lines = data.splitlines(keepends=True)
+    return b''.join(lines[-count:]).decode('utf-8', errors='replace')
+
 @app.route('/debug/log')
 def view_log():
-    """View the last 100 lines of the log file (for debugging)"""
+    """View the last lines of the log file (100 by default, ?lines= up to 5000) for debugging"""
     try:
-        with open(log_file, 'r') as f:
-            lines = f.readlines()
-            last_lines = lines[-100:] if len(lines) > 100 else lines
-            return Response(''.join(last_lines), mimetype='text/plain')
+        count = min(max(request.args.get('lines', 100, type=int), 1), 5000)
+        return Response(tail_lines(log_file, count), mimetype='text/plain')
     except Exception as e:
         logger.error(f"Error reading log file: {str(e)}")
         return jsonify({'error': f'Error reading log file: {str(e)}'}), 500
@@ -885,6 +3342,26 @@ def view_env():
     
     return jsonify(env_vars)
 
+@app.route('/debug/cache')
+def view_cache():
+    """View response cache statistics (for debugging)"""
+    return jsonify(response_cache.stats())
+
+@app.route('/metrics')
+def view_metrics():
+    """Prometheus-style metrics for this worker process"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/debug/scheduler')
+def view_scheduler():
+    """View OpenAI rate-limit scheduler state (for debugging)"""
+    return jsonify(dict(
+        openai_scheduler.stats(),
+        request_queue=request_queue.stats(),
+        task_queue=task_queue.stats(),
+        hedging=hedge_policy.stats()
+    ))
+
 @app.route('/debug/files')
 def view_files():
     """View files in upload and processed folders (for debugging)"""
@@ -0,0 +1,63 @@
+"""Compare model calls per letter: fixed character slicing vs the token-budgeted chunker
+
+Usage: python benchmarks/bench_chunker.py
+"""
+import os
+import sys
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.INFO)
+
+import app  # noqa: E402
+from latin_corpus import make_letter  # noqa: E402
+
+LETTER_SIZES = [2000, 8000, 20000, 40000, 80000]
+
+
+def slice_chunks(text, chunk_size):
+    """The previous chunking: cut every chunk_size characters"""
+    return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+
+
+def broken_words(chunks):
+    """Count chunk boundaries that fall inside a word"""
+    return sum(
+        1 for a, b in zip(chunks, chunks[1:])
+        if a and b and not a[-1].isspace() and not b[0].isspace()
+    )
+
+
+def main():
+    print(f"Budgets (tokens): correction={app.correction_chunk_budget()} "
+          f"translation={app.translation_chunk_budget()} pipelined={app.pipelined_chunk_budget()}")
+    print()
+    header = f"{'letter chars':>12} | {'sliced calls':>12} | {'chunker calls':>13} | {'pipelined calls':>15} | {'sliced mid-word cuts':>20}"
+    print(header)
+    print("-" * len(header))
+
+    totals = [0, 0, 0]
+    for seed, size in enumerate(LETTER_SIZES):
+        text = make_letter(size, seed=seed)
+        sliced = slice_chunks(text, 4000)
+        # The old flow re-sliced the corrected text at 3000 characters for translation
+        sliced_calls = len(sliced) + len(slice_chunks(text, 3000))
+        chunked_calls = len(app.plan_chunks(text, app.correction_chunk_budget())) + \
+            len(app.plan_chunks(text, app.translation_chunk_budget()))
+        pipelined_calls = 2 * len(app.plan_chunks(text, app.pipelined_chunk_budget()))
+
+        # The chunker must reproduce the text exactly when joined back together
+        assert "\n".join(app.plan_chunks(text, app.correction_chunk_budget())) == text
+
+        totals[0] += sliced_calls
+        totals[1] += chunked_calls
+        totals[2] += pipelined_calls
+        print(f"{len(text):>12} | {sliced_calls:>12} | {chunked_calls:>13} | {pipelined_calls:>15} | {broken_words(sliced):>20}")
+
+    print("-" * len(header))
+    print(f"{'total':>12} | {totals[0]:>12} | {totals[1]:>13} | {totals[2]:>15} |")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""Benchmark the bulk three-column table writer against the per-row python-docx writer
+
+Checks that both produce the same table (cell text, column widths, table style,
+and the effective alignment, font size, bold and spacing of every cell
+paragraph) and reports rows/second for each.
+
+Usage: python benchmarks/bench_docx_writer.py [rows ...]
+"""
+import os
+import sys
+import time
+import logging
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.INFO)
+
+import app  # noqa: E402
+from docx import Document  # noqa: E402
+from docx.shared import Pt  # noqa: E402
+from docx.enum.text import WD_ALIGN_PARAGRAPH  # noqa: E402
+from latin_corpus import make_paragraph  # noqa: E402
+
+DEFAULT_ROW_COUNTS = [100, 1000, 5000]
+
+
+def legacy_add_three_column_table(doc, section, rows):
+    """The previous writer: one add_row per row, with direct formatting on every run"""
+    table = doc.add_table(rows=1, cols=3)
+    table.style = 'Table Grid'
+    table.autofit = False
+    table.allow_autofit = False
+    available_width = section.page_width - section.left_margin - section.right_margin
+    table.columns[0].width = int(available_width * 0.4)
+    table.columns[1].width = int(available_width * 0.2)
+    table.columns[2].width = int(available_width * 0.4)
+
+    header_cells = table.rows[0].cells
+    header_cells[0].text = "Latin Text"
+    header_cells[1].text = ""
+    header_cells[2].text = "Dutch Translation"
+    for cell in header_cells:
+        for paragraph in cell.paragraphs:
+            paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
+            for run in paragraph.runs:
+                run.font.bold = True
+                run.font.size = Pt(14)
+
+    for latin_para, dutch_para in rows:
+        cells = table.add_row().cells
+        cells[0].text = latin_para
+        cells[1].text = ""
+        cells[2].text = dutch_para
+        for cell in cells:
+            for paragraph in cell.paragraphs:
+                paragraph.alignment = WD_ALIGN_PARAGRAPH.LEFT
+                for run in paragraph.runs:
+                    run.font.size = Pt(12)
+
+    for row in table.rows:
+        for cell in row.cells:
+            for paragraph in cell.paragraphs:
+                paragraph.paragraph_format.space_after = Pt(12)
+    return table
+
+
+def make_rows(count):
+    import random
+    rng = random.Random(count)
+    return [[make_paragraph(rng), make_paragraph(rng)] for _ in range(count)]
+
+
+def build(writer, rows, path):
+    doc = Document()
+    section = app.setup_a3_landscape(doc)
+    start = time.perf_counter()
+    writer(doc, section, rows)
+    doc.save(path)
+    return time.perf_counter() - start
+
+
+def _from_styles(style, getter):
+    """Resolve a formatting value through a style and its base styles"""
+    value = None
+    while value is None and style is not None:
+        value = getter(style)
+        style = style.base_style
+    return value
+
+
+def _paragraph_value(paragraph, getter):
+    """Direct paragraph formatting, falling back to the paragraph style chain"""
+    value = getter(paragraph)
+    return value if value is not None else _from_styles(paragraph.style, getter)
+
+
+def _run_value(paragraph, getter):
+    """Direct formatting of the first run, falling back to the paragraph style chain"""
+    value = getter(paragraph.runs[0]) if paragraph.runs else None
+    return value if value is not None else _from_styles(paragraph.style, getter)
+
+
+def describe(path):
+    """Effective content and formatting of the single table in a document"""
+    doc = Document(path)
+    table = doc.tables[0]
+    description = {
+        'style': table.style.name,
+        'grid': [col.width for col in table.columns],
+        'cells': []
+    }
+    for row in table.rows:
+        for cell in row.cells:
+            for paragraph in cell.paragraphs:
+                has_text = bool(paragraph.text)
+                description['cells'].append((
+                    paragraph.text,
+                    _paragraph_value(paragraph, lambda p: p.paragraph_format.alignment),
+                    _paragraph_value(paragraph, lambda p: p.paragraph_format.space_after),
+                    # Run formatting only matters where there is text to format
+                    _run_value(paragraph, lambda r: r.font.size) if has_text else None,
+                    _run_value(paragraph, lambda r: r.font.bold) if has_text else None,
+                ))
+    return description
+
+
+def main():
+    row_counts = [int(arg) for arg in sys.argv[1:]] or DEFAULT_ROW_COUNTS
+    workdir = tempfile.mkdtemp(prefix='bench_docx_')
+
+    header = f"{'rows':>6} | {'legacy s':>9} | {'bulk s':>8} | {'legacy rows/s':>13} | {'bulk rows/s':>11} | {'speedup':>7} | equivalent"
+    print(header)
+    print("-" * len(header))
+    for count in row_counts:
+        rows = make_rows(count)
+        legacy_path = os.path.join(workdir, f"legacy_{count}.docx")
+        bulk_path = os.path.join(workdir, f"bulk_{count}.docx")
+        legacy_time = build(legacy_add_three_column_table, rows, legacy_path)
+        bulk_time = build(app.add_three_column_table, rows, bulk_path)
+        equivalent = describe(legacy_path) == describe(bulk_path)
+        print(f"{count:>6} | {legacy_time:>9.3f} | {bulk_time:>8.3f} | {count / legacy_time:>13.0f} | "
+              f"{count / bulk_time:>11.0f} | {legacy_time / bulk_time:>6.1f}x | {'yes' if equivalent else 'NO'}")
+        if not equivalent:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Benchmark streaming DOCX text extraction against loading the document with python-docx
+
+Writes synthetic Transkribus-style exports of increasing size, extracts their
+text both ways, checks that the results match, and reports time and the
+growth of peak resident memory during extraction (measured in a forked child
+process, so Linux/macOS only for the memory column).
+
+Usage: python benchmarks/bench_extraction.py [letter chars ...]
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logging.disable(logging.INFO)
+
+import app  # noqa: E402
+from docx import Document  # noqa: E402
+from latin_corpus import write_letter_docx  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+DEFAULT_SIZES = [20000, 200000, 1000000, 3000000]
+
+
+def legacy_extract(path):
+    """The previous extraction: full document model and string concatenation per paragraph"""
+    doc = Document(path)
+    latin_text = ""
+    for para in doc.paragraphs:
+        latin_text += para.text + "\n"
+    return latin_text
+
+
+def streaming_extract(path):
+    return app.extract_docx_text(path, include_tables=False, include_notes=False)
+
+
+def _measure(extract, path, queue):
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    text = extract(path)
+    elapsed = time.perf_counter() - start
+    after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    queue.put((elapsed, (after - before) * scale, len(text)))
+
+
+def measure(extract, path):
+    """Return (seconds, peak memory growth in bytes or None, characters extracted)"""
+    if resource is None or 'fork' not in multiprocessing.get_all_start_methods():
+        start = time.perf_counter()
+        text = extract(path)
+        return time.perf_counter() - start, None, len(text)
+    context = multiprocessing.get_context('fork')
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(extract, path, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES,
+                        help=f"letter sizes in characters (default: {' '.join(map(str, DEFAULT_SIZES))})")
+    return parser.parse_args()
+
+
+def format_memory(value):
+    return f"{value / 1024 / 1024:.1f}" if value is not None else "n/a"
+
+
+def main():
+    sizes = parse_args().sizes
+    workdir = tempfile.mkdtemp(prefix='bench_extraction_')
+
+    header = (f"{'letter chars':>12} | {'docx KB':>8} | {'python-docx s':>13} | {'streaming s':>11} | "
+              f"{'speedup':>7} | {'python-docx MB':>14} | {'streaming MB':>12} | identical")
+    print(header)
+    print("-" * len(header))
+    for seed, size in enumerate(sizes):
+        path = write_letter_docx(os.path.join(workdir, f"letter_{size}.docx"), size, seed=seed)
+        legacy_time, legacy_memory, _ = measure(legacy_extract, path)
+        streaming_time, streaming_memory, _ = measure(streaming_extract, path)
+        identical = legacy_extract(path) == streaming_extract(path)
+        print(f"{size:>12} | {os.path.getsize(path) / 1024:>8.0f} | {legacy_time:>13.3f} | {streaming_time:>11.3f} | "
+              f"{legacy_time / streaming_time:>6.1f}x | {format_memory(legacy_memory):>14} | "
+              f"{format_memory(streaming_memory):>12} | {'yes' if identical else 'NO'}")
+        if not identical:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""End-to-end pipeline benchmark against a local fake OpenAI backend
+
+Generates synthetic Latin letters, runs process_documents_thread on them with
+all model calls going to benchmarks/fake_openai.py, and reports per-stage
+timings (extraction, correction, translation, DOCX creation, compilation).
+Needs no network access and no API key.
+
+Usage: python benchmarks/bench_pipeline.py --letters 8 --sizes 4000,20000 --latency 0.3
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_openai import FakeBackendConfig, start_fake_backend  # noqa: E402
+from latin_corpus import write_letter_docx  # noqa: E402
+
+STAGES = ['extraction', 'correction', 'translation', 'combined', 'docx', 'compilation', 'task']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--letters", type=int, default=6, help="number of letters in the batch")
+    parser.add_argument("--sizes", default="3000,12000,40000", help="comma-separated letter sizes in characters, cycled")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake API seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--seconds-per-1k-chars", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.5)
+    parser.add_argument("--rpm", type=int, default=100000, help="scheduler requests/min (default: effectively unlimited)")
+    parser.add_argument("--tpm", type=int, default=100000000, help="scheduler tokens/min (default: effectively unlimited)")
+    parser.add_argument("--max-concurrent-files", type=int, default=None)
+    parser.add_argument("--max-concurrent-chunks", type=int, default=None)
+    parser.add_argument("--no-pipelined", action="store_true", help="run correction and translation as separate passes")
+    parser.add_argument("--combined", action="store_true", help="correct and translate each chunk with one JSON request")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of combined answers the fake API cuts short")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of fake API requests that straggle")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="extra seconds for a straggling request")
+    parser.add_argument("--hedge", action="store_true", help="hedge slow requests (HEDGE_REQUESTS=true)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the app's log output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+
+    config = FakeBackendConfig(args.latency, args.jitter, args.seconds_per_1k_chars,
+                               args.error_rate, args.rate_limit_rate, args.retry_after, seed=args.seed,
+                               malformed_rate=args.malformed_rate, slow_rate=args.slow_rate,
+                               slow_latency=args.slow_latency)
+    server = start_fake_backend(config)
+
+    # The app reads its configuration at import time
+    os.environ.update({
+        'OPENAI_API_KEY': 'sk-fake-benchmark',
+        'OPENAI_BASE_URL': f"http://127.0.0.1:{server.server_port}/v1",
+        'OPENAI_REQUESTS_PER_MINUTE': str(args.rpm),
+        'OPENAI_TOKENS_PER_MINUTE': str(args.tpm),
+        'TASK_DB_PATH': os.path.join(workdir, 'tasks.db'),
+        'CHECKPOINT_FOLDER': os.path.join(workdir, 'checkpoints'),
+        'RESPONSE_CACHE_ENABLED': 'false',
+        'RESUME_INTERRUPTED_TASKS': 'false',
+        'HEDGE_REQUESTS': 'true' if args.hedge else 'false',
+    })
+    if not args.verbose:
+        # Injected errors are expected; keep their tracebacks out of the report
+        logging.disable(logging.ERROR)
+    import app
+
+    app.PROCESSED_FOLDER = os.path.join(workdir, 'processed')
+    os.makedirs(app.PROCESSED_FOLDER, exist_ok=True)
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    letters_dir = os.path.join(workdir, 'letters')
+    os.makedirs(letters_dir)
+    file_paths = []
+    total_chars = 0
+    for i in range(args.letters):
+        size = sizes[i % len(sizes)]
+        total_chars += size
+        file_paths.append(write_letter_docx(os.path.join(letters_dir, f"letter_{i+1:03d}.docx"), size, seed=args.seed + i))
+
+    task_id = str(uuid.uuid4())
+    settings = {'status': 'uploaded', 'progress': 0, 'message': 'Benchmark', 'file_paths': file_paths}
+    if args.max_concurrent_files:
+        settings['max_concurrent_files'] = args.max_concurrent_files
+    if args.max_concurrent_chunks:
+        settings['max_concurrent_chunks'] = args.max_concurrent_chunks
+    if args.no_pipelined:
+        settings['pipelined'] = False
+    if args.combined:
+        settings['combined'] = True
+    app.create_task(task_id, settings)
+
+    app.stage_timings.reset()
+    start = time.perf_counter()
+    app.process_documents_thread(task_id, file_paths)
+    wall = time.perf_counter() - start
+
+    task = app.get_task(task_id)
+    failed = [entry for entry in task.get('processed_files', []) if entry.get('error')]
+    timings = app.stage_timings.snapshot()
+
+    print(f"Letters: {args.letters} ({total_chars} characters), status: {task['status']}, failed: {len(failed)}")
+    print(f"Planned chunks: {task.get('planned_chunks')}, compiled: {bool(task.get('compiled_doc'))}")
+    print(f"Wall clock: {wall:.2f}s ({args.letters / wall:.2f} letters/s, {total_chars / wall:.0f} chars/s)")
+    print()
+    header = f"{'stage':<12} | {'count':>6} | {'total s':>9} | {'mean s':>8} | {'max s':>8}"
+    print(header)
+    print("-" * len(header))
+    for stage in STAGES + sorted(set(timings) - set(STAGES)):
+        if stage in timings:
+            t = timings[stage]
+            print(f"{stage:<12} | {t['count']:>6} | {t['total']:>9.3f} | {t['mean']:>8.3f} | {t['max']:>8.3f}")
+    print()
+    print(f"Fake backend: {config.counts}")
+    print(f"Scheduler: {app.openai_scheduler.stats()}")
+    if args.hedge:
+        print(f"Hedging: {app.hedge_policy.stats()}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
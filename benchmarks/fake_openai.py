@@ -0,0 +1,185 @@
+"""Local stand-in for the OpenAI chat completions API
+
+Answers POST /v1/chat/completions with configurable latency (including a slow
+tail of stragglers), server errors and 429 rate-limit responses. Correction prompts get the Latin text back unchanged
+and translation prompts get a same-shaped pseudo-Dutch text, so downstream
+alignment and document generation do realistic work. Combined (JSON mode)
+prompts get both, one JSON entry per paragraph, or a truncated answer at the
+configured malformed rate.
+
+Usage: python benchmarks/fake_openai.py --port 8001 --latency 0.5 --rate-limit-rate 0.05
+Then run the app with OPENAI_BASE_URL=http://127.0.0.1:8001/v1 and any OPENAI_API_KEY.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+TEXT_MARKERS = [
+    ("Original Latin text:", "Provide only the corrected Latin text"),
+    ("Latin text to translate:", "Provide only the Dutch translation"),
+]
+COMBINED_MARKERS = ("strings:\n", "\n\nAnswer with a JSON object")
+
+
+class FakeBackendConfig:
+    def __init__(self, latency=0.5, jitter=0.2, seconds_per_1k_chars=0.0,
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0, seed=None, malformed_rate=0.0,
+                 slow_rate=0.0, slow_latency=10.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_1k_chars = seconds_per_1k_chars
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.malformed_rate = malformed_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'requests': 0, 'ok': 0, 'errors': 0, 'rate_limited': 0, 'malformed': 0, 'slow': 0}
+
+    def count(self, key):
+        with self.lock:
+            self.counts[key] += 1
+
+    def roll(self):
+        with self.lock:
+            return self.random.random()
+
+
+def extract_text(prompt):
+    """Pull the Latin text out of a correction or translation prompt"""
+    for start, end in TEXT_MARKERS:
+        if start in prompt and end in prompt:
+            return prompt.split(start, 1)[1].split(end, 1)[0].strip("\n")
+    return prompt
+
+
+def pseudo_dutch(text):
+    """Same lines and roughly the same length as the input, but visibly different"""
+    return "\n".join(" ".join(word[::-1] for word in line.split(" ")) for line in text.split("\n"))
+
+
+def combined_answer(prompt):
+    """JSON answer to a combined prompt: each paragraph unchanged plus its pseudo-Dutch"""
+    start, end = COMBINED_MARKERS
+    paragraphs = json.loads(prompt.split(start, 1)[1].split(end, 1)[0])
+    return json.dumps({"paragraphs": [{"latin": p, "dutch": pseudo_dutch(p)} for p in paragraphs]}, ensure_ascii=False)
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            config.count('requests')
+            if not self.path.endswith("/chat/completions"):
+                self.send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+                return
+
+            roll = config.roll()
+            if roll < config.rate_limit_rate:
+                config.count('rate_limited')
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"retry-after": str(config.retry_after)})
+                return
+            if roll < config.rate_limit_rate + config.error_rate:
+                config.count('errors')
+                time.sleep(config.latency / 2)
+                self.send_json(500, {"error": {"message": "Injected server error", "type": "server_error"}})
+                return
+
+            prompt = body["messages"][-1]["content"]
+            if body.get("response_format", {}).get("type") == "json_object":
+                content = combined_answer(prompt)
+                if config.malformed_rate and config.roll() < config.malformed_rate:
+                    config.count('malformed')
+                    content = content[:len(content) // 2]
+            else:
+                text = extract_text(prompt)
+                content = pseudo_dutch(text) if "Dutch" in body["messages"][0]["content"] else text
+
+            delay = config.latency + config.random.uniform(-config.jitter, config.jitter) \
+                + config.seconds_per_1k_chars * len(content) / 1000
+            if config.slow_rate and config.roll() < config.slow_rate:
+                config.count('slow')
+                delay += config.slow_latency
+            time.sleep(max(0.0, delay))
+
+            config.count('ok')
+            prompt_tokens = len(prompt) // 4
+            completion_tokens = len(content) // 4
+            self.send_json(200, {
+                "id": f"chatcmpl-fake-{config.counts['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content}
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            })
+
+    return Handler
+
+
+def start_fake_backend(config, host="127.0.0.1", port=0):
+    """Start the fake API on a background thread; returns the server (see server.server_port)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.5, help="base seconds per request")
+    parser.add_argument("--jitter", type=float, default=0.2, help="+/- seconds of uniform noise")
+    parser.add_argument("--seconds-per-1k-chars", type=float, default=0.0, help="extra latency per 1000 output characters")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests answered with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="fraction of JSON answers cut short")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction of requests that straggle")
+    parser.add_argument("--slow-latency", type=float, default=10.0, help="extra seconds for a straggling request")
+    args = parser.parse_args()
+
+    config = FakeBackendConfig(args.latency, args.jitter, args.seconds_per_1k_chars,
+                               args.error_rate, args.rate_limit_rate, args.retry_after,
+                               malformed_rate=args.malformed_rate, slow_rate=args.slow_rate,
+                               slow_latency=args.slow_latency)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"Fake OpenAI API on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(config.counts)
+
+
+if __name__ == "__main__":
+    main()
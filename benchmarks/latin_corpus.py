@@ -0,0 +1,46 @@
+"""Synthetic Latin letters for the benchmarks in this folder"""
+import random
+
+WORDS = (
+    "ad amicum suum salutem plurimam dicit levinus ammonius carthusiensis frater "
+    "gratia tibi literas tuas accepi quibus nihil mihi gratius esse potuit nam "
+    "in hac solitudine nostra rara sunt talia solatia quae animum reficiunt "
+    "deus optimus maximus te servet incolumem cum tuis omnibus vale ex monasterio "
+    "nostro quod est prope gandavum anno domini millesimo quingentesimo vicesimo "
+    "erasmus noster valet ut audio et libros suos novos edidit quos legere cupio "
+    "frater noster in christo carissime scripsisti de rebus tuis et de studiis "
+    "litterarum quae hodie florent magis quam antea propter bonos viros"
+).split()
+
+
+def make_sentence(rng):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(6, 24))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + rng.choice([".", ".", ".", ";", "?", ":"])
+
+
+def make_paragraph(rng):
+    return " ".join(make_sentence(rng) for _ in range(rng.randint(1, 8)))
+
+
+def make_letter(n_chars, seed=0):
+    """Return a letter of roughly n_chars characters, one paragraph per line"""
+    rng = random.Random(seed)
+    paragraphs = []
+    length = 0
+    while length < n_chars:
+        paragraph = make_paragraph(rng)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 1
+    return "\n".join(paragraphs) + "\n"
+
+
+def write_letter_docx(path, n_chars, seed=0):
+    """Save a synthetic letter as a DOCX with one paragraph per line, like a Transkribus export"""
+    from docx import Document
+
+    doc = Document()
+    for paragraph in make_letter(n_chars, seed).split("\n"):
+        doc.add_paragraph(paragraph)
+    doc.save(path)
+    return path
@@ -0,0 +1,238 @@
+"""Process a local folder of letters without the web app
+
+Walks a directory for .docx letters and runs each through the same extraction,
+correction, translation and document functions as the web app, several letters
+at a time. Outputs mirror the input tree under the output folder. A manifest in
+the output folder records every finished letter with its content hash and the
+pipeline fingerprint (model, prompts, processing mode, extraction settings). Re-running the
+command skips letters that are already done, so an interrupted run resumes
+where it stopped, and a prompt change reprocesses everything. Chunks answered
+before an interruption come from the response cache.
+
+Usage: python process_corpus.py letters/ --output processed_corpus/ --jobs 4 --compile
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+MANIFEST_NAME = 'manifest.jsonl'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="folder of .docx letters (searched recursively)")
+    parser.add_argument("--output", default=None, help="output folder (default: <input>_processed)")
+    parser.add_argument("--jobs", type=int, default=None, help="letters processed at once (default: MAX_CONCURRENT_FILES)")
+    parser.add_argument("--max-concurrent-chunks", type=int, default=None, help="chunk requests in flight per letter")
+    parser.add_argument("--no-pipelined", action="store_true", help="run correction and translation as separate passes")
+    parser.add_argument("--combined", action="store_true", help="correct and translate each chunk with one JSON request")
+    parser.add_argument("--force", action="store_true", help="reprocess letters the manifest lists as done")
+    parser.add_argument("--limit", type=int, default=None, help="process at most this many letters")
+    parser.add_argument("--compile", action="store_true", help="also write one document with every finished letter")
+    parser.add_argument("--verbose", action="store_true", help="show the app's log output on the console")
+    return parser.parse_args()
+
+
+def find_letters(root, exclude=None):
+    """Relative paths of the .docx files under root, in a stable order, leaving out the exclude folder"""
+    letters = []
+    for folder, dirs, files in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if os.path.join(folder, d) != exclude)
+        for name in sorted(files):
+            # Skip Word's lock files (~$letter.docx)
+            if name.lower().endswith('.docx') and not name.startswith('~$'):
+                letters.append(os.path.relpath(os.path.join(folder, name), root))
+    return letters
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_manifest(path):
+    """Latest manifest record per letter; a line cut short by an interruption is ignored"""
+    done = {}
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                done[record['letter']] = record
+    return done
+
+
+def is_done(record, content_hash, fingerprint, output_dir):
+    return (
+        record is not None
+        and record['content_hash'] == content_hash
+        and record['fingerprint'] == fingerprint
+        and os.path.exists(os.path.join(output_dir, record['output']))
+    )
+
+
+def main():
+    args = parse_args()
+    input_dir = os.path.abspath(args.input)
+    if not os.path.isdir(input_dir):
+        sys.exit(f"Not a folder: {args.input}")
+    output_dir = os.path.abspath(args.output or input_dir.rstrip(os.sep) + '_processed')
+    os.makedirs(output_dir, exist_ok=True)
+
+    # The app reads its configuration at import time. A batch run must not pick
+    # up the web app's interrupted tasks, and its console output is the summary
+    os.environ['RESUME_INTERRUPTED_TASKS'] = 'false'
+    if not args.verbose:
+        os.environ.setdefault('CONSOLE_LOG_LEVEL', 'WARNING')
+    import app
+
+    if not os.environ.get('OPENAI_API_KEY'):
+        sys.exit("OPENAI_API_KEY is not set")
+
+    jobs = args.jobs or app.MAX_CONCURRENT_FILES
+    max_in_flight = args.max_concurrent_chunks or app.MAX_CONCURRENT_CHUNKS
+    pipelined = not args.no_pipelined and app.PIPELINED_PROCESSING
+    combined = args.combined or app.COMBINED_PROCESSING
+    fingerprint = app.pipeline_fingerprint(combined)
+
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path)
+    manifest_lock = threading.Lock()
+
+    letters = find_letters(input_dir, exclude=output_dir)
+    if args.limit:
+        letters = letters[:args.limit]
+    print(f"Found {len(letters)} letters in {input_dir}; writing to {output_dir}")
+
+    counts = {'processed': 0, 'skipped': 0, 'incomplete': 0, 'failed': 0, 'invalid': 0}
+    chars = [0]
+    counts_lock = threading.Lock()
+
+    def count(key, letter, characters=0):
+        with counts_lock:
+            counts[key] += 1
+            chars[0] += characters
+            # Printed under the lock so lines from different threads don't interleave
+            print(f"[{sum(counts.values())}/{len(letters)}] {key}: {letter}", flush=True)
+
+    def process_letter(letter):
+        source = os.path.join(input_dir, letter)
+        folder, name = os.path.split(os.path.splitext(letter)[0])
+        output = os.path.join(folder, f"processed_{name}.docx")
+        output_path = os.path.join(output_dir, output)
+
+        content_hash = file_hash(source)
+        if not args.force and is_done(manifest.get(letter), content_hash, fingerprint, output_dir):
+            count('skipped', letter)
+            return
+        if not app.is_valid_docx(source):
+            app.logger.info(f"Skipping {letter}: not a Word document")
+            count('invalid', letter)
+            return
+
+        try:
+            with app.timed_stage('extraction'):
+                latin_text = app.extract_docx_text(source)
+            # Each letter queues its chunk requests as its own job, so letters share request slots fairly
+            job = (f"batch:{letter}", app.TASK_PRIORITIES['normal'])
+            # Stages of the parts that fell back to placeholder or uncorrected text
+            failures = []
+            if pipelined or combined:
+                corrected_latin, dutch_translation = app.correct_and_translate_with_chatgpt(
+                    latin_text, max_in_flight, job=job, combined=combined, failures=failures
+                )
+            else:
+                corrected_latin = app.correct_latin_with_chatgpt(latin_text, max_in_flight, job=job, failures=failures)
+                dutch_translation = app.translate_latin_to_dutch_with_chatgpt(
+                    corrected_latin, max_in_flight, job=job, failures=failures
+                )
+
+            rows = app.align_paragraphs(corrected_latin, dutch_translation)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            if not app.write_three_column_document(rows, output_path):
+                count('failed', letter)
+                return
+            app.save_aligned_rows(output_path, os.path.splitext(os.path.basename(output_path))[0], rows)
+
+            # Letters with uncorrected or placeholder text are written but not marked done, so the next run retries them
+            if failures or any(marker in dutch_translation for marker in app.FALLBACK_MARKERS):
+                count('incomplete', letter, len(latin_text))
+                return
+            record = {
+                'letter': letter,
+                'output': output,
+                'content_hash': content_hash,
+                'fingerprint': fingerprint,
+                'finished': time.time()
+            }
+            with manifest_lock:
+                manifest[letter] = record
+                with open(manifest_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+            count('processed', letter, len(latin_text))
+        except Exception as e:
+            app.logger.error(f"Error processing {letter}: {str(e)}")
+            app.logger.error(traceback.format_exc())
+            count('failed', letter)
+
+    app.stage_timings.reset()
+    start = time.perf_counter()
+    interrupted = False
+    executor = ThreadPoolExecutor(max_workers=max(1, jobs))
+    try:
+        futures = [executor.submit(process_letter, letter) for letter in letters]
+        for future in as_completed(futures):
+            future.result()
+    except KeyboardInterrupt:
+        # Letters already running finish and are recorded; the rest are left for the next run
+        interrupted = True
+        print("Interrupted; waiting for the letters in progress (Ctrl-C again to abort)", flush=True)
+        executor.shutdown(wait=True, cancel_futures=True)
+    executor.shutdown(wait=True)
+    wall = time.perf_counter() - start
+
+    if args.compile and not interrupted:
+        finished = [manifest[letter] for letter in letters if letter in manifest]
+        if finished:
+            compiled_path = os.path.join(output_dir, 'compiled_letters.docx')
+            letters_rows = [app.letter_from_output(os.path.join(output_dir, record['output'])) for record in finished]
+            if app.compile_documents(letters_rows, compiled_path):
+                print(f"Compiled {len(finished)} letters into {compiled_path}")
+
+    processed = counts['processed'] + counts['incomplete']
+    print()
+    print(f"Letters: {len(letters)} found, {counts['processed']} processed, {counts['skipped']} already done, "
+          f"{counts['incomplete']} incomplete, {counts['failed']} failed, {counts['invalid']} not Word documents"
+          + (" (interrupted)" if interrupted else ""))
+    wall = max(wall, 1e-6)
+    print(f"Wall clock: {wall:.2f}s ({processed / wall:.2f} letters/s, {chars[0] / wall:.0f} chars/s)")
+    timings = app.stage_timings.snapshot()
+    if timings:
+        print()
+        header = f"{'stage':<12} | {'count':>6} | {'total s':>9} | {'mean s':>8} | {'max s':>8}"
+        print(header)
+        print("-" * len(header))
+        for stage, t in sorted(timings.items()):
+            print(f"{stage:<12} | {t['count']:>6} | {t['total']:>9.3f} | {t['mean']:>8.3f} | {t['max']:>8.3f}")
+    scheduler = app.openai_scheduler.stats()
+    cache = app.response_cache.stats()
+    print()
+    print(f"OpenAI requests: {scheduler['requests']} ({scheduler['rate_limited']} rate limited, "
+          f"average wait {scheduler['average_wait']}s); response cache hits: {cache['hits']}")
+    if counts['failed'] or counts['incomplete'] or interrupted:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
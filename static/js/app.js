@@ -15,6 +15,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Global variables
     let currentTaskId = null;
     let statusCheckInterval = null;
+    let statusEventSource = null;
     
     // Handle file selection via click
     if (dropZone) {
@@ -67,8 +68,8 @@ document.addEventListener('DOMContentLoaded', function() {
         for (let i = 0; i < files.length; i++) {
             const file = files[i];
             
-            // Check if file is a DOCX
-            if (file.name.endsWith('.docx')) {
+            // Check if file is a DOCX or a ZIP archive of them
+            if (file.name.endsWith('.docx') || file.name.toLowerCase().endsWith('.zip')) {
                 validFiles++;
                 
                 // Create file item
@@ -96,7 +97,7 @@ document.addEventListener('DOMContentLoaded', function() {
         if (invalidFiles > 0) {
             const warningItem = document.createElement('div');
             warningItem.className = 'alert alert-warning mt-2';
-            warningItem.textContent = `${invalidFiles} file(s) were skipped. Only DOCX files are supported.`;
+            warningItem.textContent = `${invalidFiles} file(s) were skipped. Only DOCX files and ZIP archives are supported.`;
             selectedFiles.appendChild(warningItem);
         }
         
@@ -124,12 +125,20 @@ document.addEventListener('DOMContentLoaded', function() {
         
         // Create FormData
         const formData = new FormData();
+        let uploadUrl = '/upload';
         
-        // Add files from file input
-        for (let i = 0; i < fileInput.files.length; i++) {
-            const file = fileInput.files[i];
-            if (file.name.endsWith('.docx')) {
-                formData.append('files[]', file);
+        // A ZIP archive is uploaded on its own; its letters are read on the server
+        const archive = Array.from(fileInput.files).find(file => file.name.toLowerCase().endsWith('.zip'));
+        if (archive) {
+            formData.append('archive', archive);
+            uploadUrl = '/upload-zip';
+        } else {
+            // Add files from file input
+            for (let i = 0; i < fileInput.files.length; i++) {
+                const file = fileInput.files[i];
+                if (file.name.endsWith('.docx')) {
+                    formData.append('files[]', file);
+                }
             }
         }
         
@@ -146,7 +155,7 @@ document.addEventListener('DOMContentLoaded', function() {
         progressBar.style.width = '5%';
         
         // Upload files
-        fetch('/upload', {
+        fetch(uploadUrl, {
             method: 'POST',
             body: formData
         })
@@ -160,6 +169,12 @@ document.addEventListener('DOMContentLoaded', function() {
             // Store task ID
             currentTaskId = data.task_id;
             
+            // Every letter was processed before; the results are ready
+            if (data.status === 'completed') {
+                statusMessage.textContent = 'These letters were processed before. Loading results...';
+                return null;
+            }
+            
             // Update status
             statusMessage.textContent = 'Files uploaded successfully. Starting processing...';
             progressBar.style.width = '15%';
@@ -170,6 +185,9 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         })
         .then(response => {
+            if (!response) {
+                return null;
+            }
             if (!response.ok) {
                 throw new Error('Network response was not ok');
             }
@@ -177,7 +195,9 @@ document.addEventListener('DOMContentLoaded', function() {
         })
         .then(data => {
             // Start checking status
-            statusMessage.textContent = 'Processing started. This may take several minutes...';
+            if (data) {
+                statusMessage.textContent = 'Processing started. This may take several minutes...';
+            }
             startStatusCheck();
         })
         .catch(error => {
@@ -203,6 +223,79 @@ document.addEventListener('DOMContentLoaded', function() {
     
     // Start checking status
     function startStatusCheck() {
+        stopStatusCheck();
+        
+        // Prefer server-pushed progress events; fall back to polling
+        if (window.EventSource) {
+            startEventStream();
+        } else {
+            startPolling();
+        }
+    }
+    
+    // Stop event stream and polling
+    function stopStatusCheck() {
+        if (statusEventSource) {
+            statusEventSource.close();
+            statusEventSource = null;
+        }
+        if (statusCheckInterval) {
+            clearInterval(statusCheckInterval);
+            statusCheckInterval = null;
+        }
+    }
+    
+    // Receive progress through Server-Sent Events
+    function startEventStream() {
+        let receivedEvent = false;
+        const source = new EventSource(`/events/${currentTaskId}`);
+        statusEventSource = source;
+        
+        let openTimeout = null;
+        
+        function fallBackToPolling() {
+            clearTimeout(openTimeout);
+            source.close();
+            if (statusEventSource === source) {
+                statusEventSource = null;
+                startPolling();
+            }
+        }
+        
+        // A server with no free threads may leave the connection hanging instead of refusing it
+        function waitForOpen() {
+            clearTimeout(openTimeout);
+            openTimeout = setTimeout(() => {
+                if (source.readyState !== EventSource.OPEN) {
+                    fallBackToPolling();
+                }
+            }, 5000);
+        }
+        waitForOpen();
+        
+        source.onopen = () => {
+            clearTimeout(openTimeout);
+        };
+        
+        source.addEventListener('status', (event) => {
+            receivedEvent = true;
+            handleStatus(JSON.parse(event.data));
+        });
+        
+        source.onerror = () => {
+            // The browser reconnects on its own when the server recycles the stream;
+            // only fall back to polling if the stream never worked or was closed for good
+            // (a 503 from a busy server closes it)
+            if (!receivedEvent || source.readyState === EventSource.CLOSED) {
+                fallBackToPolling();
+            } else {
+                waitForOpen();
+            }
+        };
+    }
+    
+    // Poll the status endpoint
+    function startPolling() {
         if (statusCheckInterval) {
             clearInterval(statusCheckInterval);
         }
@@ -224,34 +317,7 @@ document.addEventListener('DOMContentLoaded', function() {
             return response.json();
         })
         .then(data => {
-            // Update progress
-            progressBar.style.width = `${data.progress}%`;
-            statusMessage.textContent = data.message;
-            
-            // Check if processing is complete
-            if (data.status === 'completed') {
-                clearInterval(statusCheckInterval);
-                showResults(data);
-            }
-            // Check if there was an error
-            else if (data.status === 'error') {
-                clearInterval(statusCheckInterval);
-                statusMessage.textContent = `Error: ${data.message}`;
-                
-                // Add retry button
-                const retryBtn = document.createElement('button');
-                retryBtn.className = 'btn btn-primary mt-3';
-                retryBtn.textContent = 'Retry';
-                retryBtn.addEventListener('click', () => {
-                    // Remove retry button
-                    retryBtn.remove();
-                    
-                    // Try again
-                    uploadAndProcessFiles();
-                });
-                
-                processingStatus.appendChild(retryBtn);
-            }
+            handleStatus(data);
         })
         .catch(error => {
             console.error('Error:', error);
@@ -259,6 +325,38 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Update the page from a status record
+    function handleStatus(data) {
+        // Update progress
+        progressBar.style.width = `${data.progress}%`;
+        statusMessage.textContent = data.message;
+        
+        // Check if processing is complete
+        if (data.status === 'completed') {
+            stopStatusCheck();
+            showResults(data);
+        }
+        // Check if there was an error
+        else if (data.status === 'error') {
+            stopStatusCheck();
+            statusMessage.textContent = `Error: ${data.message}`;
+            
+            // Add retry button
+            const retryBtn = document.createElement('button');
+            retryBtn.className = 'btn btn-primary mt-3';
+            retryBtn.textContent = 'Retry';
+            retryBtn.addEventListener('click', () => {
+                // Remove retry button
+                retryBtn.remove();
+                
+                // Try again
+                uploadAndProcessFiles();
+            });
+            
+            processingStatus.appendChild(retryBtn);
+        }
+    }
+    
     // Show results
     function showResults(data) {
         processingStatus.style.display = 'none';
@@ -298,6 +396,24 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         }
         
+        // Offer every document of the task as one ZIP
+        if (data.processed_files && data.processed_files.filter(file => file.processed_name).length > 1) {
+            const downloadAllItem = document.createElement('div');
+            downloadAllItem.className = 'col-12 mb-4 text-end';
+            downloadAllItem.innerHTML = `
+                <a href="/download-all/${currentTaskId}" class="btn btn-primary">Download All (ZIP)</a>
+            `;
+            resultsList.prepend(downloadAllItem);
+        }
+        
+        // List archive entries that were not processed
+        if (data.skipped_files && data.skipped_files.length > 0) {
+            const skippedItem = document.createElement('div');
+            skippedItem.className = 'col-12 alert alert-warning';
+            skippedItem.textContent = `Skipped from archive: ${data.skipped_files.map(file => `${file.name} (${file.reason})`).join(', ')}`;
+            resultsList.appendChild(skippedItem);
+        }
+        
         // Add compiled document card if available
         if (data.compiled_doc) {
             const compiledCard = document.createElement('div');
@@ -349,6 +465,59 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     // Show preview modal
+    // Load one page of a document preview into the preview modal
+    function loadPreviewPage(filename, page) {
+        const previewContent = document.getElementById('preview-content');
+        const spinnerContainer = document.querySelector('.spinner-container');
+        
+        fetch(`/preview/${filename}?page=${page}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Preview not available');
+            }
+            return response.text();
+        })
+        .then(html => {
+            if (filename.endsWith('.docx')) {
+                // Rendered rows of the Latin text and Dutch translation
+                previewContent.innerHTML = html;
+                previewContent.querySelectorAll('.preview-page-btn').forEach(button => {
+                    button.addEventListener('click', () => {
+                        loadPreviewPage(filename, parseInt(button.dataset.page, 10));
+                    });
+                });
+            } else {
+                // For other files, show a message
+                previewContent.innerHTML = `
+                    <div class="alert alert-info">
+                        Preview not available for this file type. Please download the file to view it.
+                    </div>
+                `;
+            }
+            
+            // Hide spinner, show content
+            spinnerContainer.style.display = 'none';
+            previewContent.style.display = 'block';
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            
+            // Show error message
+            previewContent.innerHTML = `
+                <div class="alert alert-danger">
+                    Preview not available: ${error.message}
+                </div>
+                <div class="text-center mt-3">
+                    <p>Please download the file to view it.</p>
+                </div>
+            `;
+            
+            // Hide spinner, show content
+            spinnerContainer.style.display = 'none';
+            previewContent.style.display = 'block';
+        });
+    }
+    
     function showPreview(filename) {
         // Create modal if it doesn't exist
         let previewModal = document.getElementById('preview-modal');
@@ -403,63 +572,7 @@ document.addEventListener('DOMContentLoaded', function() {
         const modal = new bootstrap.Modal(previewModal);
         modal.show();
         
-        // Load preview
-        fetch(`/preview/${filename}`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('Preview not available');
-            }
-            return response.blob();
-        })
-        .then(blob => {
-            // Create object URL
-            const url = URL.createObjectURL(blob);
-            
-            // Create preview content based on file type
-            if (filename.endsWith('.docx')) {
-                // For DOCX, use an iframe with PDF viewer
-                previewContent.innerHTML = `
-                    <div class="alert alert-info">
-                        DOCX preview is not available directly in the browser. Please download the file to view it.
-                    </div>
-                    <div class="text-center mt-3">
-                        <img src="/static/images/docx_preview.png" alt="DOCX Preview" class="img-fluid" style="max-height: 400px;">
-                    </div>
-                `;
-            } else if (filename.endsWith('.pdf')) {
-                // For PDF, use an iframe
-                previewContent.innerHTML = `
-                    <iframe src="${url}" class="preview-iframe"></iframe>
-                `;
-            } else {
-                // For other files, show a message
-                previewContent.innerHTML = `
-                    <div class="alert alert-info">
-                        Preview not available for this file type. Please download the file to view it.
-                    </div>
-                `;
-            }
-            
-            // Hide spinner, show content
-            spinnerContainer.style.display = 'none';
-            previewContent.style.display = 'block';
-        })
-        .catch(error => {
-            console.error('Error:', error);
-            
-            // Show error message
-            previewContent.innerHTML = `
-                <div class="alert alert-danger">
-                    Preview not available: ${error.message}
-                </div>
-                <div class="text-center mt-3">
-                    <p>Please download the file to view it.</p>
-                </div>
-            `;
-            
-            // Hide spinner, show content
-            spinnerContainer.style.display = 'none';
-            previewContent.style.display = 'block';
-        });
+        // Load the first page of the preview
+        loadPreviewPage(filename, 1);
     }
 });